@@ -0,0 +1,69 @@
+"""Защита кеша от «набегания» (cache stampede).
+
+Когда популярный ключ истекает, пересобрать его должен один процесс,
+а не каждый воркер. ``get_or_build`` для этого:
+
+* пересобирает значение чуть раньше срока с вероятностью, растущей к
+  концу срока (probabilistic early expiration, XFetch);
+* берёт блокировку через атомарный ``cache.add`` — остальные в это
+  время отдают устаревшее значение или ждут нового.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+# Сколько держится блокировка, если пересборщик упал
+LOCK_TIMEOUT = 10
+# Сколько устаревшее значение живёт после срока годности
+STALE_GRACE = 60
+WAIT_STEP = 0.05
+# Чем больше, тем раньше начинается досрочная пересборка
+BETA = 1.0
+
+
+def _is_fresh(entry, beta):
+    _, delta, expires = entry
+    if expires is None:
+        return True
+    early = delta * beta * math.log(1 - random.random())
+    return time.time() - early < expires
+
+
+def _wait_for(key):
+    deadline = time.time() + LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_or_build(key, build, timeout, beta=BETA):
+    """Значение из кеша или результат ``build()``; ``timeout`` в секундах
+    (``None`` — бессрочно)."""
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, beta):
+        return entry[0]
+    locked = cache.add(f'{key}:lock', 1, LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            return entry[0]
+        entry = _wait_for(key)
+        if entry is not None:
+            return entry[0]
+    try:
+        started = time.time()
+        value = build()
+        delta = time.time() - started
+        if timeout is None:
+            cache.set(key, (value, delta, None), None)
+        else:
+            cache.set(key, (value, delta, time.time() + timeout),
+                      timeout + STALE_GRACE)
+    finally:
+        if locked:
+            cache.delete(f'{key}:lock')
+    return value
@@ -0,0 +1,129 @@
+"""Кеш в файле SQLite, общий для всех процессов на одной машине.
+
+Локальная замена memcached/redis: воркеры gunicorn видят одни и те же
+ключи, поэтому сброс поколений и блокировки от «набегания» на кеш
+работают согласованно. ``add`` и ``incr`` атомарны между процессами.
+"""
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Доля операций set, после которых удаляются просроченные записи
+CULL_PROBABILITY = 0.01
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=30,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB, expires REAL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return None if expires is None else float(expires)
+
+    def _fetch(self, connection, key):
+        row = connection.execute(
+            'SELECT value, expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] <= time.time():
+            connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+            return None
+        return row
+
+    def get(self, key, default=None, version=None):
+        row = self._fetch(self._connection(), self._key(key, version))
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (self._key(key, version), pickle.dumps(value),
+             self._expires(timeout)),
+        )
+        if random.random() < CULL_PROBABILITY:
+            connection.execute('DELETE FROM cache WHERE expires <= ?',
+                               (time.time(),))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if self._fetch(connection, key) is not None:
+                return False
+            connection.execute(
+                'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                (key, pickle.dumps(value), self._expires(timeout)),
+            )
+            return True
+        finally:
+            connection.execute('COMMIT')
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = self._fetch(connection, key)
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute('UPDATE cache SET value = ? WHERE key = ?',
+                               (pickle.dumps(value), key))
+            return value
+        finally:
+            connection.execute('COMMIT')
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        if self._fetch(connection, key) is None:
+            return False
+        connection.execute('UPDATE cache SET expires = ? WHERE key = ?',
+                           (self._expires(timeout), key))
+        return True
+
+    def has_key(self, key, version=None):
+        return self._fetch(self._connection(),
+                           self._key(key, version)) is not None
+
+    def delete(self, key, version=None):
+        self._connection().execute('DELETE FROM cache WHERE key = ?',
+                                   (self._key(key, version),))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение остаётся открытым в потоке: это дешевле, чем
+        # открывать файл заново на каждый запрос
+        pass
@@ -0,0 +1,36 @@
+"""SQLite для нескольких воркеров gunicorn.
+
+Стандартный бэкенд с двумя опциями в ``DATABASES[...]['OPTIONS']``:
+
+* ``pragmas`` — PRAGMA, которые выполняются на каждом новом соединении
+  (WAL, ``synchronous``, ``mmap_size``, ``cache_size``,
+  ``busy_timeout``…);
+* ``immediate_transactions`` — ``transaction.atomic`` начинается с
+  ``BEGIN IMMEDIATE``. Отложенная транзакция, которая сначала читает, а
+  потом пишет, в WAL не ждёт ``busy_timeout`` и сразу падает с
+  «database is locked», если писатель успел раньше; IMMEDIATE берёт
+  блокировку записи в начале и ждёт её.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop('pragmas', {})
+        self.immediate_transactions = kwargs.pop('immediate_transactions',
+                                                 False)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.immediate_transactions:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
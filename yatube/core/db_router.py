@@ -0,0 +1,85 @@
+"""Чтение с реплик с гарантией «читаю свои записи».
+
+``ReplicaMiddleware`` разрешает читать с реплик только GET/HEAD-запросам
+к представлениям из ``settings.REPLICA_VIEWS``; всё остальное, включая
+фоновые задачи, идёт в основную базу. Запрос, который что-то записал,
+ставит cookie ``REPLICA_PIN_COOKIE`` на ``REPLICA_STICKY_SECONDS``
+секунд, и пока она жива, запросы этого пользователя тоже читают из
+основной базы: только что опубликованный пост виден автору, даже если
+реплика ещё не догнала основную базу.
+
+Сессии всегда читаются из основной базы: свежая сессия после входа
+может ещё не дойти до реплики.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_PIN_COOKIE = 'primary_pin'
+PRIMARY_APPS = {'sessions'}
+
+_local = threading.local()
+
+
+def reset():
+    _local.replica = _local.wrote = False
+
+
+def allow_replica():
+    _local.replica = True
+
+
+def wrote():
+    return getattr(_local, 'wrote', False)
+
+
+def using_replica():
+    """Читает ли текущий запрос с реплики."""
+    return (getattr(_local, 'replica', False) and not wrote()
+            and bool(settings.DATABASE_REPLICAS))
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS or not using_replica():
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        # Дальше в этом запросе читаем только что записанное
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Все базы проекта — копии основной
+        return True
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтения и ставит cookie после записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset()
+        try:
+            response = self.get_response(request)
+            if wrote() or request.method not in ('GET', 'HEAD'):
+                response.set_cookie(
+                    REPLICA_PIN_COOKIE, '1',
+                    max_age=settings.REPLICA_STICKY_SECONDS,
+                    httponly=True, samesite='Lax',
+                )
+            return response
+        finally:
+            reset()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD')
+                and request.resolver_match.view_name in settings.REPLICA_VIEWS
+                and REPLICA_PIN_COOKIE not in request.COOKIES):
+            allow_replica()
@@ -0,0 +1,46 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Удаляет истёкшие сессии пачками: каждая пачка — короткая '
+            'транзакция, и запись в базу не блокируется надолго. '
+            'Заменяет clearsessions из django.contrib.sessions')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Сколько сессий удалять за транзакцию')
+        parser.add_argument('--max-batches', type=int,
+                            help='Остановиться после стольких пачек')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Пауза между пачками, секунд')
+
+    def handle(self, *args, **options):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not hasattr(store, 'get_model_class'):
+            # Кеш и подписанные cookie истекают сами
+            try:
+                store.clear_expired()
+            except NotImplementedError:
+                raise CommandError(
+                    f'{settings.SESSION_ENGINE} не умеет удалять '
+                    'истёкшие сессии')
+            return
+        model = store.get_model_class()
+        expired = model.objects.filter(expire_date__lt=timezone.now())
+        limit = options['max_batches']
+        deleted = batches = 0
+        while limit is None or batches < limit:
+            keys = list(expired.order_by().values_list(
+                'session_key', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += model.objects.filter(session_key__in=keys).delete()[0]
+            batches += 1
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(f'Удалено сессий: {deleted}, пачек: {batches}')
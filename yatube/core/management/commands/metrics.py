@@ -0,0 +1,47 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import metrics
+
+COLUMNS = ('count', 'mean', 'p50', 'p90', 'p99', 'max')
+
+
+class Command(BaseCommand):
+    help = ('Сводка p50/p90/p99 по представлениям из снимков всех '
+            'процессов в METRICS_DIR')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести сводку в JSON')
+        parser.add_argument('--view', help='Только это представление')
+        parser.add_argument('--sort', choices=('name',) + COLUMNS,
+                            default='name',
+                            help='Сортировка метрик внутри представления; '
+                                 'по значению — от большего')
+
+    def handle(self, *args, **options):
+        if not settings.METRICS_DIR:
+            raise CommandError('METRICS_DIR не задан')
+        data = metrics.merge(metrics.load_dumps(settings.METRICS_DIR))
+        if options['view']:
+            data = {options['view']: data.get(options['view'], {})}
+        summary = metrics.summarize(data)
+        if options['json']:
+            self.stdout.write(json.dumps(summary, ensure_ascii=False,
+                                         indent=2))
+            return
+        if not summary:
+            self.stdout.write('Замеров пока нет')
+            return
+        self.stdout.write(f'{"":<16}' + ''.join(
+            f'{column:>10}' for column in COLUMNS))
+        for view, values in summary.items():
+            self.stdout.write(view)
+            rows = values.items()
+            if options['sort'] != 'name':
+                rows = sorted(rows, key=lambda item: -item[1][options['sort']])
+            for name, row in rows:
+                self.stdout.write(f'  {name:<14}' + ''.join(
+                    f'{row[column]:>10}' for column in COLUMNS))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import metrics, tasks
+
+
+class Command(BaseCommand):
+    help = ('Воркер очереди задач DatabaseBackend: забирает готовые '
+            'задачи из core_task и выполняет их')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20,
+                            help='Сколько задач забирать за раз')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Пауза между опросами пустой очереди, '
+                                 'секунд')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        backend = tasks.get_backend()
+        if not isinstance(backend, tasks.DatabaseBackend):
+            raise CommandError('TASKS_BACKEND — не DatabaseBackend')
+        done = failed = 0
+        while True:
+            jobs = backend.claim(options['batch_size'])
+            for job in jobs:
+                if backend.execute(job):
+                    done += 1
+                else:
+                    failed += 1
+            metrics.flush(force=options['once'])
+            if not jobs:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(f'Выполнено задач: {done}, с ошибкой: {failed}')
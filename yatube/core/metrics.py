@@ -0,0 +1,324 @@
+"""Гистограммы производительности по представлениям.
+
+``MetricsMiddleware`` собирает для каждого запроса время ответа, число и
+время SQL-запросов, время рендера шаблонов, попадания и промахи кеша и
+время создания миниатюр, а затем складывает их в гистограммы процесса
+по имени представления (``posts:index``, ``posts:profile``, …).
+
+С ``settings.TEMPLATE_PROFILING`` к ним добавляется время каждого шаблона
+и каждого ``{% include %}``.
+
+Гистограммы процесса отдаёт ``/metrics/`` (только персоналу). Если задан
+``settings.METRICS_DIR``, каждый процесс сбрасывает туда свой снимок
+после первого запроса, затем раз в ``METRICS_FLUSH_INTERVAL`` секунд и
+при выходе, а ``manage.py metrics`` объединяет снимки всех воркеров.
+"""
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Границы корзин растут в 1.25 раза: погрешность перцентиля до 25 %
+BUCKET_GROWTH = 1.25
+BUCKET_COUNT = 80
+BOUNDS = [0.0] + [0.01 * BUCKET_GROWTH ** i for i in range(BUCKET_COUNT)]
+
+# Фоновые задачи вне запроса пишутся под этим именем
+BACKGROUND = 'background'
+UNRESOLVED = 'unresolved'
+
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}
+# Первый снимок пишется сразу: короткий процесс может не дожить до
+# интервала
+_last_flush = None
+
+
+class Histogram:
+    """Гистограмма с логарифмическими корзинами; сливается с другими."""
+
+    def __init__(self, counts=None, total=0.0, maximum=0.0):
+        self.counts = counts or [0] * (len(BOUNDS) + 1)
+        self.total = total
+        self.maximum = maximum
+
+    def add(self, value):
+        low, high = 0, len(BOUNDS)
+        while low < high:
+            middle = (low + high) // 2
+            if BOUNDS[middle] < value:
+                low = middle + 1
+            else:
+                high = middle
+        self.counts[low] += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def percentile(self, q):
+        """Верхняя граница корзины, в которую попал q-й перцентиль."""
+        count = self.count
+        if not count:
+            return 0.0
+        rank = math.ceil(q / 100 * count)
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen >= rank:
+                if index < len(BOUNDS):
+                    return min(BOUNDS[index], self.maximum)
+                return self.maximum
+        return self.maximum
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    def summary(self):
+        count = self.count
+        return {
+            'count': count,
+            'mean': round(self.total / count, 3) if count else 0.0,
+            'p50': round(self.percentile(50), 3),
+            'p90': round(self.percentile(90), 3),
+            'p99': round(self.percentile(99), 3),
+            'max': round(self.maximum, 3),
+        }
+
+    def to_dict(self):
+        return {'counts': self.counts, 'total': self.total,
+                'maximum': self.maximum}
+
+
+def record(view, values):
+    """Добавляет значения одного запроса в гистограммы представления."""
+    with _lock:
+        metrics = _histograms.setdefault(view, {})
+        for name, value in values.items():
+            metrics.setdefault(name, Histogram()).add(value)
+
+
+def observe(name, value):
+    """Значение в текущий запрос или, вне запроса, сразу в гистограмму."""
+    values = getattr(_local, 'values', None)
+    if values is None:
+        record(BACKGROUND, {name: value})
+    else:
+        values[name] = values.get(name, 0) + value
+
+
+@contextmanager
+def timer(name):
+    """Измеряет время блока в миллисекундах."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - started) * 1000)
+
+
+def snapshot():
+    with _lock:
+        return {
+            view: {name: histogram.to_dict()
+                   for name, histogram in metrics.items()}
+            for view, metrics in _histograms.items()
+        }
+
+
+def summarize(data):
+    """Сводка p50/p90/p99 по снимку вида ``snapshot()``."""
+    return {
+        view: {name: Histogram(**histogram).summary()
+               for name, histogram in sorted(metrics.items())}
+        for view, metrics in sorted(data.items())
+    }
+
+
+def merge(snapshots):
+    merged = {}
+    for data in snapshots:
+        for view, metrics in data.items():
+            for name, histogram in metrics.items():
+                target = merged.setdefault(view, {}).setdefault(
+                    name, Histogram())
+                target.merge(Histogram(**histogram))
+    return {
+        view: {name: histogram.to_dict()
+               for name, histogram in metrics.items()}
+        for view, metrics in merged.items()
+    }
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def flush(force=False):
+    """Сбрасывает снимок процесса в ``METRICS_DIR`` не чаще раза в
+    ``METRICS_FLUSH_INTERVAL`` секунд; первый — сразу."""
+    global _last_flush
+    directory = settings.METRICS_DIR
+    now = time.time()
+    if not directory or (
+            not force and _last_flush is not None
+            and now - _last_flush < settings.METRICS_FLUSH_INTERVAL):
+        return
+    _last_flush = now
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump(snapshot(), file)
+    os.replace(f'{path}.tmp', path)
+
+
+def _flush_at_exit():
+    # Процессы без замеров (migrate, shell) снимков не оставляют
+    if _histograms:
+        flush(force=True)
+
+
+def load_dumps(directory):
+    snapshots = []
+    if not os.path.isdir(directory):
+        return snapshots
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name)) as file:
+                snapshots.append(json.load(file))
+    return snapshots
+
+
+def _count_cache(hits, misses):
+    values = getattr(_local, 'values', None)
+    # BaseCache.get_many вызывает get для каждого ключа
+    if values is not None and not getattr(_local, 'in_get_many', False):
+        values['cache_hits'] += hits
+        values['cache_misses'] += misses
+
+
+def _instrument_cache(backend):
+    if getattr(backend, '_metrics_installed', False):
+        return
+    missing = object()
+    get, get_many = backend.get, backend.get_many
+
+    def instrumented_get(self, key, default=None, version=None):
+        value = get(self, key, missing, version)
+        if value is missing:
+            _count_cache(0, 1)
+            return default
+        _count_cache(1, 0)
+        return value
+
+    def instrumented_get_many(self, keys, version=None):
+        keys = list(keys)
+        _local.in_get_many = True
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            _local.in_get_many = False
+        _count_cache(len(found), len(keys) - len(found))
+        return found
+
+    backend.get = instrumented_get
+    backend.get_many = instrumented_get_many
+    backend._metrics_installed = True
+
+
+def _instrument_templates():
+    from django.template.backends.django import Template
+
+    if getattr(Template, '_metrics_installed', False):
+        return
+    render = Template.render
+
+    def instrumented_render(self, context=None, request=None):
+        with timer('template_ms'):
+            return render(self, context, request)
+
+    Template.render = instrumented_render
+    Template._metrics_installed = True
+
+
+def _include_metric(node):
+    # Узел разбирается один раз, имя считается при первом рендере
+    name = getattr(node, '_metric_name', None)
+    if name is None:
+        origin = node.origin.template_name if node.origin else '?'
+        included = node.template.token.strip('"\'')
+        name = node._metric_name = (
+            f'include:{origin}:{node.token.lineno} {included}_ms')
+    return name
+
+
+def profile_templates():
+    """Время рендера каждого шаблона (с родительскими через
+    ``{% extends %}``) и каждого узла ``{% include %}``; время вложенных
+    шаблонов входит во время внешних."""
+    from django.template.base import Template
+    from django.template.loader_tags import IncludeNode
+
+    if getattr(Template, '_profiling_installed', False):
+        return
+    render_template, render_include = Template._render, IncludeNode.render
+
+    def profiled_template(self, context):
+        with timer(f'template:{self.name}_ms'):
+            return render_template(self, context)
+
+    def profiled_include(self, context):
+        with timer(_include_metric(self)):
+            return render_include(self, context)
+
+    Template._render = profiled_template
+    IncludeNode.render = profiled_include
+    Template._profiling_installed = True
+
+
+def install():
+    """Подключает замеры к шаблонам и кешам; вызывается из
+    ``CoreConfig.ready``."""
+    _instrument_templates()
+    if settings.TEMPLATE_PROFILING:
+        profile_templates()
+    for options in settings.CACHES.values():
+        _instrument_cache(import_string(options['BACKEND']))
+    atexit.register(_flush_at_exit)
+
+
+def time_query(execute, sql, params, many, context):
+    """Обёртка ``connection.execute_wrapper`` для SQL-запросов."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        _local.values['sql_count'] += 1
+        _local.values['sql_ms'] += (time.perf_counter() - started) * 1000
+
+
+def start_request():
+    _local.values = {
+        'sql_count': 0, 'sql_ms': 0.0, 'template_ms': 0.0,
+        'cache_hits': 0, 'cache_misses': 0,
+    }
+
+
+def finish_request(view, wall_ms):
+    values = _local.values
+    del _local.values
+    values['wall_ms'] = wall_ms
+    record(view, values)
+    flush()
@@ -0,0 +1,29 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """Замеры запроса в гистограммы ``core.metrics`` по имени
+    представления; должна стоять первой в ``MIDDLEWARE``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics.start_request()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.time_query))
+                return self.get_response(request)
+        finally:
+            match = getattr(request, 'resolver_match', None)
+            view = match.view_name if match else metrics.UNRESOLVED
+            metrics.finish_request(
+                view, (time.perf_counter() - started) * 1000)
@@ -0,0 +1,34 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Задача очереди ``core.tasks.DatabaseBackend``."""
+
+    name = models.CharField(max_length=200)
+    args = models.TextField(default='[]')
+    # Имя и аргументы: одинаковые ожидающие задачи не дублируются
+    key = models.CharField(max_length=255)
+    created = models.DateTimeField(default=timezone.now)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_at'], name='task_run_at_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=Q(locked_until__isnull=True,
+                            failed_at__isnull=True),
+                name='unique_pending_task',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} {self.args}'
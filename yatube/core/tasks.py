@@ -0,0 +1,218 @@
+"""Очередь фоновых задач для побочных эффектов записи.
+
+Задача — функция, помеченная ``@task``; её аргументы должны
+сериализоваться в JSON. ``func.enqueue(*args)`` ставит задачу в очередь,
+поэтому ответ на POST уходит, как только запись зафиксирована, а
+индексирование, рассылка в ленты и миниатюры выполняются позже.
+Бэкенд задаёт ``settings.TASKS_BACKEND``:
+
+* ``ThreadBackend`` — пул потоков процесса; задачи отправляются после
+  фиксации транзакции и теряются при перезапуске процесса;
+* ``DatabaseBackend`` — таблица ``core_task`` в той же транзакции, что и
+  запись; задачи выполняет ``manage.py run_tasks``;
+* ``ImmediateBackend`` — сразу в вызывающем коде (тесты).
+
+Одинаковые (имя и аргументы) ещё не начатые задачи схлопываются в одну.
+Упавшая задача повторяется с удваивающейся задержкой до
+``TASKS_MAX_ATTEMPTS`` раз. Время выполнения, ожидание в очереди и
+ошибки попадают в гистограммы ``core.metrics`` под именем
+``task:<имя задачи>``.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def task(func):
+    """Регистрирует функцию как задачу и добавляет ей ``enqueue``."""
+    name = f'{func.__module__}.{func.__name__}'
+    _registry[name] = func
+    func.task_name = name
+    func.enqueue = partial(enqueue, name)
+    return func
+
+
+def _key(name, args):
+    key = f'{name}:{json.dumps(args, sort_keys=True)}'
+    if len(key) > 255:
+        key = f'{name}:{hashlib.md5(key.encode()).hexdigest()}'
+    return key
+
+
+def retry_delay(attempt):
+    return settings.TASKS_RETRY_DELAY * 2 ** (attempt - 1)
+
+
+def run(name, args, enqueued_at=None):
+    """Выполняет задачу и записывает её замеры."""
+    func = _registry.get(name) or import_string(name)
+    started = time.time()
+    values = {}
+    if enqueued_at is not None:
+        values['queue_ms'] = max(0.0, (started - enqueued_at) * 1000)
+    try:
+        func(*args)
+    except Exception:
+        values['task_errors'] = 1
+        raise
+    finally:
+        values['task_ms'] = (time.time() - started) * 1000
+        metrics.record(f'task:{name}', values)
+
+
+class ImmediateBackend:
+    """Выполняет задачу сразу, в транзакции вызывающего кода."""
+
+    def submit(self, name, args):
+        run(name, args)
+
+
+class ThreadBackend:
+    """Пул потоков процесса; повторы — по таймеру."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.TASKS_WORKERS,
+                    thread_name_prefix='tasks',
+                )
+        return self._executor
+
+    def submit(self, name, args):
+        # Задача видит запись только после фиксации транзакции
+        transaction.on_commit(lambda: self._submit(name, args))
+
+    def _submit(self, name, args):
+        key = _key(name, args)
+        with self._lock:
+            if key in self._pending:
+                metrics.record(f'task:{name}', {'deduplicated': 1})
+                return
+            self._pending.add(key)
+        self._get_executor().submit(
+            self._run, name, args, key, time.time(), 1)
+
+    def _run(self, name, args, key, enqueued_at, attempt):
+        # Повторная постановка во время выполнения не должна теряться
+        with self._lock:
+            self._pending.discard(key)
+        try:
+            run(name, args, enqueued_at)
+        except Exception:
+            if attempt >= settings.TASKS_MAX_ATTEMPTS:
+                logger.exception('Задача %s%r не выполнена', name, args)
+                return
+            timer = threading.Timer(
+                retry_delay(attempt), self._get_executor().submit,
+                (self._run, name, args, key, time.time(), attempt + 1),
+            )
+            timer.daemon = True
+            timer.start()
+        finally:
+            # Соединения с БД у каждого потока пула свои
+            connections.close_all()
+
+
+class DatabaseBackend:
+    """Надёжная очередь в таблице ``core_task``."""
+
+    def submit(self, name, args):
+        from .models import Task
+
+        # INSERT OR IGNORE: уникальный индекс по ключу ожидающих задач
+        Task.objects.bulk_create(
+            [Task(name=name, args=json.dumps(args), key=_key(name, args))],
+            ignore_conflicts=True,
+        )
+
+    def claim(self, limit):
+        """Забирает до ``limit`` готовых задач на ``TASKS_LEASE`` секунд.
+
+        Задача, чей воркер не уложился в аренду (например, упал),
+        снова становится доступна.
+        """
+        from .models import Task
+
+        now = timezone.now()
+        available = Task.objects.filter(
+            Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+            failed_at__isnull=True, run_at__lte=now,
+        )
+        pks = list(available.order_by('run_at', 'pk').values_list(
+            'pk', flat=True)[:limit])
+        lease = now + timedelta(seconds=settings.TASKS_LEASE)
+        claimed = [
+            pk for pk in pks
+            if available.filter(pk=pk).update(locked_until=lease)
+        ]
+        return list(Task.objects.filter(pk__in=claimed).order_by(
+            'run_at', 'pk'))
+
+    def execute(self, job):
+        """Выполняет задачу; возвращает True при успехе."""
+        enqueued_at = job.created.timestamp()
+        try:
+            # Упавшая задача не оставляет половину своих изменений
+            with transaction.atomic():
+                run(job.name, json.loads(job.args), enqueued_at)
+        except Exception:
+            self.fail(job, traceback.format_exc())
+            return False
+        job.delete()
+        return True
+
+    def fail(self, job, error):
+        job.attempts += 1
+        job.last_error = error
+        job.locked_until = None
+        if job.attempts >= settings.TASKS_MAX_ATTEMPTS:
+            logger.error('Задача %s %s не выполнена:\n%s',
+                         job.name, job.args, error)
+            job.failed_at = timezone.now()
+        else:
+            job.run_at = timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts))
+        try:
+            with transaction.atomic():
+                job.save()
+        except IntegrityError:
+            # Такая же задача уже ждёт в очереди и сделает ту же работу
+            job.delete()
+
+
+def get_backend():
+    path = settings.TASKS_BACKEND
+    with _backends_lock:
+        if path not in _backends:
+            _backends[path] = import_string(path)()
+        return _backends[path]
+
+
+def enqueue(name, *args):
+    get_backend().submit(name, list(args))
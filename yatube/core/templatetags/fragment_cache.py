@@ -0,0 +1,53 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags.cache import CacheNode
+
+from core.cache import get_or_build
+
+register = template.Library()
+
+
+class FragmentCacheNode(CacheNode):
+    """Как ``{% cache %}``, но пересобирает фрагмент один процесс."""
+
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                '"fragment_cache" tag got an unknown variable: %r'
+                % self.expire_time_var.var
+            )
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    '"fragment_cache" tag got a non-integer timeout value: %r'
+                    % expire_time
+                )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        return get_or_build(key, lambda: self.nodelist.render(context),
+                            expire_time)
+
+
+@register.tag('fragment_cache')
+def do_fragment_cache(parser, token):
+    """
+    {% fragment_cache timeout name [vary_on ...] %} ... {% endfragment_cache %}
+    """
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            "'%r' tag requires at least 2 arguments." % tokens[0]
+        )
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+        None,
+    )
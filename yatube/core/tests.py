@@ -0,0 +1,369 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.template.base import Template
+from django.template.loader_tags import IncludeNode
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import db_router, metrics, tasks
+from core.cache import get_or_build
+from core.models import Task
+from posts.models import Post
+
+User = get_user_model()
+
+calls = []
+
+
+@tasks.task
+def remember(value):
+    calls.append(value)
+
+
+@tasks.task
+def explode():
+    raise ValueError('boom')
+
+
+CACHE_FILE = os.path.join(tempfile.mkdtemp(), 'cache.sqlite3')
+SQLITE_CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': CACHE_FILE,
+    }
+}
+
+
+@override_settings(CACHES=SQLITE_CACHES)
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_set_get_and_expire(self):
+        cache.set('key', {'a': 1}, 60)
+        self.assertEqual(cache.get('key'), {'a': 1})
+        cache.set('short', 1, 0)
+        self.assertIsNone(cache.get('short'))
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+
+    def test_add_and_incr_are_atomic(self):
+        self.assertTrue(cache.add('lock', 1, 60))
+        self.assertFalse(cache.add('lock', 2, 60))
+        self.assertEqual(cache.incr('lock', 5), 6)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+
+@override_settings(CACHES=SQLITE_CACHES)
+class StampedeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        time.sleep(0.2)
+        return 'fragment'
+
+    def test_concurrent_misses_build_once(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                get_or_build('posts:index', self.build, 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(results, ['fragment'] * 8)
+
+    def test_stale_value_is_served_while_rebuilding(self):
+        cache.set('posts:index', ('old', 0.1, time.time() - 1), 60)
+        cache.add('posts:index:lock', 1, 10)
+        self.assertEqual(get_or_build('posts:index', self.build, 60), 'old')
+        self.assertEqual(self.builds, 0)
+
+    def test_rebuilds_early_near_expiry(self):
+        # Пересборка шла 10⁶ секунд, до конца срока 1 секунда: ранняя
+        # пересборка почти наверняка
+        cache.set('posts:index', ('old', 10 ** 6, time.time() + 1), 60)
+        self.assertEqual(get_or_build('posts:index', lambda: 'new', 60),
+                         'new')
+
+
+class HistogramTests(SimpleTestCase):
+    def test_percentiles_within_bucket_error(self):
+        histogram = metrics.Histogram()
+        for value in range(1, 101):
+            histogram.add(value)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.percentile(50), 50,
+                               delta=50 * (metrics.BUCKET_GROWTH - 1))
+        self.assertEqual(histogram.percentile(100), 100)
+
+    def test_merge_snapshots(self):
+        first, second = metrics.Histogram(), metrics.Histogram()
+        first.add(1)
+        second.add(3)
+        merged = metrics.merge([
+            {'posts:index': {'wall_ms': first.to_dict()}},
+            {'posts:index': {'wall_ms': second.to_dict()}},
+        ])
+        summary = metrics.summarize(merged)['posts:index']['wall_ms']
+        self.assertEqual(summary['count'], 2)
+        self.assertEqual(summary['max'], 3)
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        cache.clear()
+
+    def test_records_request_by_view_name(self):
+        Client().get(reverse('posts:index'))
+        Client().get(reverse('posts:index'))
+        data = metrics.summarize(metrics.snapshot())['posts:index']
+        self.assertEqual(data['wall_ms']['count'], 2)
+        self.assertGreater(data['sql_count']['max'], 0)
+        self.assertGreater(data['template_ms']['max'], 0)
+        # Второй запрос берёт фрагмент ленты из кеша
+        self.assertGreater(data['cache_hits']['max'], 0)
+        self.assertGreater(data['cache_misses']['max'], 0)
+
+    def test_endpoint_is_staff_only(self):
+        client = Client()
+        response = client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        client.force_login(staff)
+        client.get(reverse('posts:index'))
+        response = client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('posts:index', response.json())
+
+
+class MetricsFlushTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = os.path.join(directory.name, 'metrics')
+        patcher = mock.patch.object(metrics, '_last_flush', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        metrics.reset()
+
+    def flushed_requests(self):
+        data = metrics.merge(metrics.load_dumps(self.directory))
+        return metrics.summarize(data)['posts:index']['wall_ms']['count']
+
+    def test_first_request_and_exit_write_snapshots(self):
+        with override_settings(METRICS_DIR=self.directory,
+                               METRICS_FLUSH_INTERVAL=3600):
+            Client().get(reverse('posts:index'))
+            self.assertEqual(self.flushed_requests(), 1)
+            Client().get(reverse('posts:index'))
+            self.assertEqual(self.flushed_requests(), 1)
+            metrics._flush_at_exit()
+            self.assertEqual(self.flushed_requests(), 2)
+
+
+class TemplateProfilingTests(TestCase):
+    def setUp(self):
+        # profile_templates() подменяет рендер на весь процесс: после
+        # теста возвращаем исходные методы
+        for patcher in (
+            mock.patch.object(Template, '_render', Template._render),
+            mock.patch.object(IncludeNode, 'render', IncludeNode.render),
+            mock.patch.object(Template, '_profiling_installed', False,
+                              create=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        metrics.profile_templates()
+        metrics.reset()
+        cache.clear()
+
+    def test_records_templates_and_includes(self):
+        Client().get(reverse('posts:index'))
+        data = metrics.snapshot()['posts:index']
+        self.assertIn('template:posts/index.html_ms', data)
+        self.assertIn('template:base.html_ms', data)
+        self.assertTrue(any(
+            name.startswith('include:base.html:')
+            and name.endswith(' includes/header.html_ms')
+            for name in data
+        ))
+
+
+@override_settings(TASKS_BACKEND='core.tasks.DatabaseBackend',
+                   TASKS_MAX_ATTEMPTS=2)
+class DatabaseQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        metrics.reset()
+
+    def test_worker_runs_deduplicated_tasks(self):
+        remember.enqueue(1)
+        remember.enqueue(1)
+        remember.enqueue(2)
+        self.assertEqual(Task.objects.count(), 2)
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertEqual(calls, [1, 2])
+        self.assertFalse(Task.objects.exists())
+        data = metrics.summarize(metrics.snapshot())
+        self.assertEqual(data['task:core.tests.remember']['task_ms']['count'],
+                         2)
+
+    def test_failed_task_is_retried_later(self):
+        explode.enqueue()
+        call_command('run_tasks', once=True, stdout=StringIO())
+        job = Task.objects.get()
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(job.failed_at)
+        self.assertIn('boom', job.last_error)
+        # Пока первая попытка ждёт повтора, дубль не ставится
+        explode.enqueue()
+        self.assertEqual(Task.objects.count(), 1)
+        Task.objects.update(run_at=job.created)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            call_command('run_tasks', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.failed_at)
+        # Окончательно упавшая задача не мешает поставить новую
+        explode.enqueue()
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_expired_lease_is_claimed_again(self):
+        remember.enqueue(3)
+        backend = tasks.get_backend()
+        self.assertEqual(len(backend.claim(10)), 1)
+        self.assertEqual(backend.claim(10), [])
+        Task.objects.update(locked_until=timezone.now())
+        self.assertEqual(len(backend.claim(10)), 1)
+
+
+class ThreadQueueTests(SimpleTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_pending_duplicates_are_dropped(self):
+        backend = tasks.ThreadBackend()
+        executor = backend._get_executor()
+        started = threading.Event()
+        release = threading.Event()
+        # Занимаем все потоки пула, чтобы задачи ждали в очереди
+        for _ in range(executor._max_workers):
+            executor.submit(lambda: (started.set(), release.wait(5)))
+        started.wait(5)
+        # Вне транзакции on_commit выполняется сразу
+        backend.submit('core.tests.remember', [1])
+        backend.submit('core.tests.remember', [1])
+        release.set()
+        executor.shutdown(wait=True)
+        self.assertEqual(calls, [1])
+
+
+class SQLiteTuningTests(TestCase):
+    def test_connection_pragmas(self):
+        if not settings.SQLITE_TUNING:
+            self.skipTest('SQLITE_TUNING=0')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0],
+                             settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            # 1 — NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class SessionTests(TestCase):
+    def test_clearsessions_deletes_expired_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'old{i}', session_data='',
+                     expire_date=now - timedelta(days=1)) for i in range(5)]
+            + [Session(session_key='alive', session_data='',
+                       expire_date=now + timedelta(days=1))]
+        )
+        out = StringIO()
+        call_command('clearsessions', batch_size=2, max_batches=2,
+                     stdout=out)
+        self.assertIn('Удалено сессий: 4, пачек: 2', out.getvalue())
+        call_command('clearsessions', batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['alive'])
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_session_read_skips_database(self):
+        user = get_user_model().objects.create_user(username='reader')
+        client = Client()
+        client.force_login(user)
+        url = reverse('posts:follow_index')
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        self.assertFalse(any('django_session' in query['sql']
+                             for query in queries))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # «Реплика» отстаёт: в ней есть пользователь, но нет его поста
+        cls.user = User.objects.create_user(username='author')
+        User.objects.using('replica').create(
+            id=cls.user.pk, username='author', password=cls.user.password)
+        Post.objects.create(author=cls.user, text='только в основной')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(ReplicaRoutingTests.user)
+
+    def test_read_only_views_read_from_replica(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'только в основной')
+        self.assertNotIn(db_router.REPLICA_PIN_COOKIE, response.cookies)
+        # Остальные представления читают из основной базы
+        response = self.client.get(
+            reverse('posts:post_edit', args=[Post.objects.get().pk]))
+        self.assertContains(response, 'только в основной')
+
+    def test_author_reads_own_write(self):
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'свежий пост'})
+        self.assertIn(db_router.REPLICA_PIN_COOKIE, self.client.cookies)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'свежий пост')
+        # Другие пользователи без cookie читают с реплики
+        response = Client().get(reverse('posts:index'))
+        self.assertNotContains(response, 'свежий пост')
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(db_router.ReplicaRouter().db_for_write(Post),
+                         'default')
+        self.assertEqual(Post.objects.using('replica').count(), 0)
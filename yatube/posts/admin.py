@@ -2,6 +2,7 @@ from django.contrib import admin
 # Из модуля models импортируем модель Post
 from .models import Post
 from .models import Group
+from .search import search
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -14,6 +15,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу вместо LIKE '%...%' по всей таблице
+        if not search_term:
+            return queryset, False
+        found = search(search_term).values('pk')
+        return queryset.filter(pk__in=found), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
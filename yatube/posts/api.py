@@ -0,0 +1,182 @@
+"""JSON API лент и страницы поста только для чтения.
+
+Строки читаются через ``values()`` без создания моделей и пагинируются
+курсором, как HTML-ленты. ETag строится из поколений тех же областей
+кеша, что и фрагменты лент (``posts/feed_cache.py``), а Last-Modified —
+из даты самого свежего поста ленты. Поэтому повторный запрос без
+изменений стоит одного обращения к кешу и одного запроса по индексу и
+получает 304.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import OuterRef, Subquery
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from .feed_cache import fragment_key
+from .models import Comment, Group, Post, User
+from .paginator import COMMENT_ORDERING, COMMENTS_PER_PAGE, paginate
+from .timeline import FEED_ORDERING, feed_for
+
+POST_FIELDS = ('pk', 'text', 'pub_date', 'author__username', 'group__slug',
+               'image')
+COMMENT_FIELDS = ('pk', 'text', 'created', 'author__username')
+
+
+def _newest(queryset, field):
+    return Subquery(queryset.order_by(f'-{field}').values(field)[:1])
+
+
+def index_state(request):
+    newest = Post.objects.order_by('-pub_date', '-pk').values_list(
+        'pub_date', flat=True).first()
+    return [('index',)], newest
+
+
+def group_state(request, slug):
+    row = Group.objects.filter(slug=slug).annotate(newest=_newest(
+        Post.objects.filter(group=OuterRef('pk')), 'pub_date'
+    )).values_list('pk', 'newest').first()
+    if row is None:
+        raise Http404
+    return [('group', row[0])], row[1]
+
+
+def profile_state(request, username):
+    row = User.objects.filter(username=username).annotate(newest=_newest(
+        Post.objects.filter(author=OuterRef('pk')), 'pub_date'
+    )).values_list('pk', 'newest').first()
+    if row is None:
+        raise Http404
+    return [('author', row[0])], row[1]
+
+
+def follow_state(request):
+    # Правка любого поста меняет поколение index, рассылка в ленты —
+    # timeline, подписка — follows
+    newest = feed_for(request.user).order_by(*FEED_ORDERING).values_list(
+        'feed_date', flat=True).first()
+    scopes = [('index',), ('timeline',), ('follows', request.user.pk)]
+    return scopes, newest
+
+
+def post_state(request, post_id):
+    row = Post.objects.filter(pk=post_id).annotate(newest=_newest(
+        Comment.objects.filter(post=OuterRef('pk')), 'created'
+    )).values_list('pub_date', 'newest').first()
+    if row is None:
+        raise Http404
+    newest = max(date for date in row if date)
+    return [('post', post_id), ('comments', post_id)], newest
+
+
+def conditional(state):
+    """``condition`` с ETag и Last-Modified из ``state(request, ...)``,
+    которая возвращает области кеша и дату последнего изменения."""
+    def cached_state(request, kwargs):
+        if not hasattr(request, '_feed_state'):
+            request._feed_state = state(request, **kwargs)
+        return request._feed_state
+
+    def etag(request, **kwargs):
+        scopes, _ = cached_state(request, kwargs)
+        return hashlib.md5(
+            fragment_key(request, *scopes).encode()).hexdigest()
+
+    def last_modified(request, **kwargs):
+        return cached_state(request, kwargs)[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'detail': 'Нужна авторизация'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _post(row):
+    return {
+        'id': row['pk'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': row['image'] or None,
+    }
+
+
+def _comment(row):
+    return {
+        'id': row['pk'],
+        'text': row['text'],
+        'created': row['created'],
+        'author': row['author__username'],
+    }
+
+
+def _link(request, query):
+    return f'{request.path}?{query}' if query else None
+
+
+def _page(request, queryset, serialize, fields, **options):
+    ordering = options.get('ordering', ('-pub_date', '-pk'))
+    keys = [name.lstrip('-') for name in ordering if name not in fields]
+    page = paginate(request, queryset.values(*fields, *keys), **options)
+    return {
+        'results': [serialize(row) for row in page],
+        'next': _link(request, page.next_query),
+        'previous': _link(request, page.previous_query),
+    }
+
+
+def _feed(request, queryset, **options):
+    return JsonResponse(_page(request, queryset, _post, POST_FIELDS,
+                              **options))
+
+
+@require_GET
+@conditional(index_state)
+def index(request):
+    return _feed(request, Post.objects.all())
+
+
+@require_GET
+@conditional(group_state)
+def group_posts(request, slug):
+    return _feed(request, Post.objects.filter(group__slug=slug))
+
+
+@require_GET
+@conditional(profile_state)
+def profile(request, username):
+    return _feed(request, Post.objects.filter(author__username=username))
+
+
+@require_GET
+@api_login_required
+@conditional(follow_state)
+def follow_index(request):
+    return _feed(request, feed_for(request.user), ordering=FEED_ORDERING)
+
+
+@require_GET
+@conditional(post_state)
+def post_detail(request, post_id):
+    row = Post.objects.filter(pk=post_id).values(
+        *POST_FIELDS, 'comments_count').first()
+    if row is None:
+        raise Http404
+    comments = _page(
+        request, Comment.objects.filter(post_id=post_id), _comment,
+        COMMENT_FIELDS, per_page=COMMENTS_PER_PAGE,
+        ordering=COMMENT_ORDERING,
+    )
+    return JsonResponse({
+        'post': {**_post(row), 'comments_count': row['comments_count']},
+        'comments': comments,
+    })
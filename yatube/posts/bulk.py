@@ -0,0 +1,46 @@
+"""Массовая загрузка данных через ``bulk_create``.
+
+``bulk_create`` не шлёт сигналов, поэтому после загрузки счётчики,
+ленты подписок и кеш лент нужно привести в порядок отдельно.
+"""
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import counters, feed_cache, timeline
+from .models import Follow
+
+
+@contextmanager
+def manual_dates(*fields):
+    """Отключает ``auto_now_add`` у полей ``(модель, имя)``, чтобы
+    сохранить даты из источника."""
+    fields = [model._meta.get_field(name) for model, name in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def finish_load(author_ids=None, batch_size=1000):
+    """Пересчитывает счётчики, сбрасывает кеш и заполняет ленты
+    подписчиков авторов ``author_ids`` (по умолчанию — всех)."""
+    counters.reconcile_authors(batch_size)
+    counters.reconcile_posts(batch_size)
+    # Сводки групп, в том числе строки для групп из bulk_create
+    counters.reconcile_groups()
+    # Ключ каждого фрагмента, страницы целиком и ETag API включает
+    # поколение ('groups',): его сброс делает устаревшими все ленты.
+    # Остальной кеш (сессии, задачи, миниатюры) не трогаем
+    feed_cache.bump(('groups',))
+    cache.delete(timeline.CELEBRITIES_CACHE_KEY)
+    if author_ids is None:
+        author_ids = Follow.objects.order_by('author_id').values_list(
+            'author_id', flat=True).distinct().iterator()
+    for author_id in author_ids:
+        with transaction.atomic():
+            timeline.backfill_author(author_id)
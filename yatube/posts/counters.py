@@ -0,0 +1,217 @@
+"""Денормализованные счётчики постов, комментариев, подписок и групп.
+
+Счётчики меняются выражениями ``F()`` из сигналов записи в той же
+транзакции, что и сама запись. Расхождения, если они всё же появятся,
+исправляет команда ``manage.py reconcile_counters``.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+
+from .models import (AuthorStats, Comment, Follow, Group, GroupAuthor,
+                     GroupStats, Post, User)
+
+STATS_FIELDS = ('posts_count', 'followers_count', 'following_count')
+GROUP_STATS_FIELDS = ('posts_count', 'authors_count', 'last_post_at')
+
+
+def author_stats(user):
+    """Счётчики пользователя; у новых пользователей строки ещё нет."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
+
+
+def bump_author(user_id, field, delta):
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        # Строку не создаём: пользователь может удаляться каскадом
+        stats.filter(**{f'{field}__gte': -delta}).update(
+            **{field: F(field) + delta})
+        return
+    with transaction.atomic():
+        if not stats.update(**{field: F(field) + delta}):
+            AuthorStats.objects.get_or_create(user_id=user_id)
+            stats.update(**{field: F(field) + delta})
+
+
+def bump_post_comments(post_id, delta):
+    Post.objects.filter(pk=post_id, comments_count__gte=-delta).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def group_stats(group):
+    try:
+        return group.stats
+    except GroupStats.DoesNotExist:
+        return GroupStats(group=group)
+
+
+def add_group_post(group_id, author_id, pub_date):
+    """Пост появился в группе: создан или перенесён в неё."""
+    with transaction.atomic():
+        rows = GroupAuthor.objects.filter(group_id=group_id,
+                                          author_id=author_id)
+        new_author = 0
+        if not rows.update(posts_count=F('posts_count') + 1):
+            GroupAuthor.objects.create(group_id=group_id,
+                                       author_id=author_id, posts_count=1)
+            new_author = 1
+        stats = GroupStats.objects.filter(group_id=group_id)
+        values = {'posts_count': F('posts_count') + 1,
+                  'authors_count': F('authors_count') + new_author}
+        if not stats.update(**values):
+            GroupStats.objects.get_or_create(group_id=group_id)
+            stats.update(**values)
+        stats.filter(Q(last_post_at__isnull=True)
+                     | Q(last_post_at__lt=pub_date)).update(
+            last_post_at=pub_date)
+
+
+def remove_group_post(group_id, author_id):
+    """Пост ушёл из группы: удалён или перенесён в другую."""
+    with transaction.atomic():
+        rows = GroupAuthor.objects.filter(group_id=group_id,
+                                          author_id=author_id)
+        gone_author = 0
+        if not rows.filter(posts_count__gt=1).update(
+                posts_count=F('posts_count') - 1):
+            gone_author = rows.delete()[0]
+        # Дата последнего поста — по индексу (group, -pub_date)
+        last = Post.objects.filter(group_id=OuterRef('group_id')).order_by(
+            '-pub_date').values('pub_date')[:1]
+        GroupStats.objects.filter(
+            group_id=group_id, posts_count__gte=1,
+            authors_count__gte=gone_author,
+        ).update(
+            posts_count=F('posts_count') - 1,
+            authors_count=F('authors_count') - gone_author,
+            last_post_at=Subquery(last),
+        )
+
+
+def remove_group_author(author_id):
+    """Пользователь удаляется: его строки ``GroupAuthor`` каскад удалит
+    раньше, чем посты пришлют ``post_delete``, поэтому авторов групп
+    уменьшаем здесь, а посты затем вычтет ``remove_group_post``."""
+    rows = GroupAuthor.objects.filter(author_id=author_id)
+    GroupStats.objects.filter(
+        group_id__in=rows.values('group_id'), authors_count__gte=1,
+    ).update(authors_count=F('authors_count') - 1)
+    rows.delete()
+
+
+def _counts(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids}).order_by().values(field)
+        .annotate(n=Count('pk')).values_list(field, 'n')
+    )
+
+
+def reconcile_authors(batch_size=1000):
+    """Пересчитывает счётчики пользователей пачками; возвращает число
+    исправленных строк."""
+    fixed = 0
+    last_pk = 0
+    while True:
+        ids = list(User.objects.filter(pk__gt=last_pk).order_by('pk')
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return fixed
+        last_pk = ids[-1]
+        posts = _counts(Post.objects, 'author', ids)
+        followers = _counts(Follow.objects, 'author', ids)
+        following = _counts(Follow.objects, 'user', ids)
+        stored = AuthorStats.objects.in_bulk(ids)
+        created, changed = [], []
+        for user_id in ids:
+            actual = dict(zip(STATS_FIELDS, (
+                posts.get(user_id, 0), followers.get(user_id, 0),
+                following.get(user_id, 0))))
+            stats = stored.get(user_id)
+            if stats is None:
+                if any(actual.values()):
+                    created.append(AuthorStats(user_id=user_id, **actual))
+            elif any(getattr(stats, field) != value
+                     for field, value in actual.items()):
+                for field, value in actual.items():
+                    setattr(stats, field, value)
+                changed.append(stats)
+        # Пачкой, а не по запросу на пользователя
+        AuthorStats.objects.bulk_create(created, ignore_conflicts=True)
+        AuthorStats.objects.bulk_update(changed, STATS_FIELDS)
+        fixed += len(created) + len(changed)
+
+
+def reconcile_posts(batch_size=1000):
+    """Пересчитывает ``Post.comments_count`` пачками."""
+    fixed = 0
+    last_pk = 0
+    while True:
+        rows = list(Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                    .values_list('pk', 'comments_count')[:batch_size])
+        if not rows:
+            return fixed
+        last_pk = rows[-1][0]
+        comments = _counts(Comment.objects, 'post', [pk for pk, _ in rows])
+        changed = [
+            Post(pk=pk, comments_count=comments.get(pk, 0))
+            for pk, stored in rows if comments.get(pk, 0) != stored
+        ]
+        Post.objects.bulk_update(changed, ['comments_count'])
+        fixed += len(changed)
+
+
+def reconcile_groups():
+    """Пересчитывает сводки групп и строки ``GroupAuthor``; групп
+    немного, поэтому без пачек. Возвращает число исправленных сводок."""
+    authors = {
+        (group_id, author_id): n
+        for group_id, author_id, n in Post.objects.filter(
+            group__isnull=False).order_by().values('group', 'author')
+        .annotate(n=Count('pk')).values_list('group', 'author', 'n')
+    }
+    stored = {(row.group_id, row.author_id): row
+              for row in GroupAuthor.objects.all()}
+    GroupAuthor.objects.filter(pk__in=[
+        row.pk for key, row in stored.items() if key not in authors
+    ]).delete()
+    GroupAuthor.objects.bulk_create([
+        GroupAuthor(group_id=group_id, author_id=author_id, posts_count=n)
+        for (group_id, author_id), n in authors.items()
+        if (group_id, author_id) not in stored
+    ])
+    changed_authors = []
+    for key, row in stored.items():
+        if key in authors and row.posts_count != authors[key]:
+            row.posts_count = authors[key]
+            changed_authors.append(row)
+    GroupAuthor.objects.bulk_update(changed_authors, ['posts_count'])
+
+    posts = {
+        group_id: (n, last) for group_id, n, last in Post.objects.filter(
+            group__isnull=False).order_by().values('group')
+        .annotate(n=Count('pk'), last=Max('pub_date'))
+        .values_list('group', 'n', 'last')
+    }
+    authors_count = {}
+    for group_id, _ in authors:
+        authors_count[group_id] = authors_count.get(group_id, 0) + 1
+    stored = GroupStats.objects.in_bulk()
+    created, changed = [], []
+    for group_id in Group.objects.values_list('pk', flat=True):
+        n, last = posts.get(group_id, (0, None))
+        actual = dict(zip(GROUP_STATS_FIELDS, (
+            n, authors_count.get(group_id, 0), last)))
+        stats = stored.get(group_id)
+        if stats is None:
+            created.append(GroupStats(group_id=group_id, **actual))
+        elif any(getattr(stats, field) != value
+                 for field, value in actual.items()):
+            for field, value in actual.items():
+                setattr(stats, field, value)
+            changed.append(stats)
+    GroupStats.objects.bulk_create(created, ignore_conflicts=True)
+    GroupStats.objects.bulk_update(changed, GROUP_STATS_FIELDS)
+    return len(created) + len(changed)
@@ -0,0 +1,89 @@
+"""Ключи кеша фрагментов лент с поколениями.
+
+Каждая область (главная лента, группа, автор, пост, комментарии поста)
+имеет счётчик поколения в кеше. Ключ фрагмента включает текущие поколения своих
+областей, поэтому сигналы записи «сбрасывают» фрагменты увеличением
+счётчика, а сами фрагменты можно хранить долго.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import db_router
+
+# Параметры запроса, от которых зависит содержимое страницы ленты
+PAGE_PARAMS = ('page', 'after', 'before', 'last')
+
+
+def _generation_key(scope):
+    return 'gen:' + ':'.join(str(part) for part in scope)
+
+
+def _fresh_generation():
+    # После вытеснения счётчика из кеша не возвращаемся к старым номерам
+    return int(time.time() * 1000)
+
+
+def generations(*scopes):
+    """Текущие поколения нескольких областей одним запросом к кешу."""
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: _fresh_generation() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_generation(), None)
+
+
+def fragment_key(request, *scopes):
+    """Ключ фрагмента: области, их поколения и страница.
+
+    Во все ключи входит область ``groups``: ссылки на группы есть в
+    каждой ленте.
+    """
+    scopes += (('groups',),)
+    page = '&'.join(
+        f'{name}={request.GET[name]}' for name in PAGE_PARAMS
+        if name in request.GET
+    )
+    current = generations(*scopes)
+    # По ним кеш страниц целиком проверяет, не устарела ли страница
+    if not hasattr(request, 'page_generations'):
+        request.page_generations = {}
+    request.page_generations.update(zip(scopes, current))
+    parts = [':'.join(str(part) for part in scope) for scope in scopes]
+    parts += [str(gen) for gen in current]
+    return '|'.join(parts + [page])
+
+
+def cache_context(request, *scopes):
+    """Переменные контекста для ``{% fragment_cache %}`` в шаблонах лент.
+
+    Фрагмент, собранный по отстающей реплике, мог не увидеть последнюю
+    запись, которая уже сменила поколение, поэтому живёт недолго.
+    """
+    return {
+        'cache_key': fragment_key(request, *scopes),
+        'cache_timeout': (settings.REPLICA_CACHE_TIMEOUT
+                          if db_router.using_replica()
+                          else settings.FEED_CACHE_TIMEOUT),
+    }
+
+
+def feed_scopes(post, group_ids=()):
+    """Области, которые затрагивает изменение поста."""
+    scopes = [('index',), ('author', post.author_id), ('post', post.pk)]
+    for group_id in {post.group_id, *group_ids}:
+        if group_id is not None:
+            scopes.append(('group', group_id))
+    return scopes
@@ -1,5 +1,7 @@
+from .images import normalize_upload
 from .models import Post, Comment
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 
 class PostForm(forms.ModelForm):
@@ -15,6 +17,12 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой относится пост'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return normalize_upload(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
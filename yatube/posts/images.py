@@ -0,0 +1,46 @@
+"""Подготовка загруженных картинок к хранению.
+
+Оригиналы с камер телефонов весят мегабайты и несут EXIF с геометкой.
+Перед сохранением картинка поворачивается по EXIF, уменьшается до
+``settings.POST_IMAGE_MAX_SIDE`` и пересохраняется без метаданных.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+JPEG_OPTIONS = {'quality': 85, 'optimize': True, 'progressive': True}
+
+
+def normalize_upload(upload):
+    """Уменьшенная копия загрузки без метаданных или сама загрузка,
+    если менять в ней нечего."""
+    upload.seek(0)
+    with Image.open(upload) as image:
+        # MPO с телефонов — JPEG с дополнительными кадрами (стереопара,
+        # превью): сохраняем первый кадр как JPEG
+        image_format = 'JPEG' if image.format == 'MPO' else image.format
+        max_side = settings.POST_IMAGE_MAX_SIDE
+        too_big = max(image.size) > max_side
+        # Анимацию пересохранение превратило бы в один кадр
+        animated = image.format != 'MPO' and getattr(
+            image, 'is_animated', False)
+        if animated or not (too_big or image.format == 'MPO'
+                            or image.getexif() or image.info.get('exif')):
+            upload.seek(0)
+            return upload
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side))
+        # Кодировщики PNG и WebP берут EXIF из image.info, если его
+        # не передать явно
+        image.info.pop('exif', None)
+        options = {'exif': b''}
+        if image_format == 'JPEG':
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            options.update(JPEG_OPTIONS)
+        buffer = BytesIO()
+        image.save(buffer, format=image_format, **options)
+    return SimpleUploadedFile(upload.name, buffer.getvalue(),
+                              content_type=upload.content_type)
@@ -0,0 +1,210 @@
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import AuthorStats, Follow, Group, Post
+from posts.paginator import POSTS_PER_PAGE
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def percentile(samples, q):
+    """q-й перцентиль по отсортированной выборке (nearest-rank)."""
+    if not samples:
+        return 0.0
+    return samples[max(0, math.ceil(q / 100 * len(samples)) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон страниц posts/urls.py: запросы в секунду '
+            'и перцентили задержки, сравнение с сохранённым базовым '
+            'прогоном')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Запросов на каждый URL')
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--wsgi', action='store_true',
+                            help='Через локальный WSGI-сервер вместо '
+                                 'тестового клиента')
+        parser.add_argument('--only', nargs='*',
+                            help='Имена представлений, например index')
+        parser.add_argument('--baseline',
+                            help='JSON с базовым прогоном для сравнения')
+        parser.add_argument('--save-baseline',
+                            help='Сохранить результаты в этот JSON')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимое замедление p50 и падение '
+                                 'RPS, доля')
+
+    def handle(self, *args, **options):
+        user, urls = self.sample_urls()
+        if options['only']:
+            urls = {name: url for name, url in urls.items()
+                    if name in options['only']}
+        session = self.login(user)
+        fetch = (self.wsgi_fetcher(session) if options['wsgi']
+                 else self.client_fetcher(session))
+        results = {}
+        for name, url in urls.items():
+            results[name] = self.run(fetch, url, options)
+            self.report(name, results[name])
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as file:
+                json.dump(results, file, indent=2)
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['tolerance'])
+
+    def sample_urls(self):
+        """Адреса posts/urls.py с правдоподобными аргументами: самый
+        читаемый автор, свежий пост, самый обсуждаемый пост, группа;
+        страницы и JSON API. Представления, которые
+        меняют данные (комментарии, подписки), не нагружаются."""
+        stats = (AuthorStats.objects.select_related('user')
+                 .order_by('-followers_count').first())
+        post = Post.objects.order_by('-pub_date', '-pk').first()
+        discussed = Post.objects.order_by('-comments_count', '-pk').first()
+        if stats is None or post is None:
+            raise CommandError('Нет данных: запустите generate_data')
+        reader = (Follow.objects.order_by('-pk').select_related('user')
+                  .first())
+        user = reader.user if reader else stats.user
+        group = Group.objects.order_by('-pk').first()
+        own_post = user.posts.order_by('-pk').first()
+        deep_page = max(1, stats.posts_count // POSTS_PER_PAGE // 2)
+        urls = {
+            'index': reverse('posts:index'),
+            'index_page_5': reverse('posts:index') + '?page=5',
+            'profile': reverse('posts:profile', args=[stats.user.username]),
+            'profile_deep': (reverse('posts:profile',
+                                     args=[stats.user.username])
+                             + f'?page={deep_page}'),
+            'post_detail': reverse('posts:post_detail', args=[post.pk]),
+            'post_comments': reverse('posts:post_comments',
+                                     args=[discussed.pk]),
+            'trending': reverse('posts:trending'),
+            'groups': reverse('posts:groups'),
+            'post_create': reverse('posts:post_create'),
+            'follow_index': reverse('posts:follow_index'),
+            'search': (reverse('posts:search') + '?'
+                       + urlencode({'q': 'котик'})),
+            'api_index': reverse('posts:api_index'),
+            'api_profile': reverse('posts:api_profile',
+                                   args=[stats.user.username]),
+            'api_post_detail': reverse('posts:api_post_detail',
+                                       args=[post.pk]),
+            'api_follow_index': reverse('posts:api_follow_index'),
+        }
+        if group:
+            urls['group_posts'] = reverse('posts:group_posts',
+                                          args=[group.slug])
+            urls['api_group_posts'] = reverse('posts:api_group_posts',
+                                              args=[group.slug])
+        if own_post:
+            urls['post_edit'] = reverse('posts:post_edit',
+                                        args=[own_post.pk])
+        return user, urls
+
+    def login(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def client_fetcher(self, session):
+        local = threading.local()
+
+        def fetch(url):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client()
+                client.cookies[settings.SESSION_COOKIE_NAME] = session
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: {response.status_code}')
+        return fetch
+
+    def wsgi_fetcher(self, session):
+        server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                             server_class=_ThreadingServer,
+                             handler_class=_QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}'
+        cookie = SimpleCookie()
+        cookie[settings.SESSION_COOKIE_NAME] = session
+        header = cookie.output(header='', sep=';').strip()
+
+        def fetch(url):
+            request = Request(base + url, headers={'Cookie': header})
+            with urlopen(request) as response:
+                response.read()
+        return fetch
+
+    def run(self, fetch, url, options):
+        for _ in range(options['warmup']):
+            fetch(url)
+
+        def timed(_):
+            started = time.perf_counter()
+            fetch(url)
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        if options['concurrency'] > 1:
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                samples = list(pool.map(timed, range(options['requests'])))
+        else:
+            samples = [timed(i) for i in range(options['requests'])]
+        elapsed = time.perf_counter() - started
+        samples.sort()
+        return {
+            'rps': round(len(samples) / elapsed, 1),
+            'p50': round(percentile(samples, 50), 2),
+            'p90': round(percentile(samples, 90), 2),
+            'p99': round(percentile(samples, 99), 2),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<16} {result["rps"]:>8} rps  p50 {result["p50"]:>8} мс'
+            f'  p90 {result["p90"]:>8} мс  p99 {result["p99"]:>8} мс'
+        )
+
+    def compare(self, results, path, tolerance):
+        with open(path) as file:
+            baseline = json.load(file)
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if result['p50'] > base['p50'] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: p50 {base["p50"]} → {result["p50"]} мс')
+            if result['rps'] < base['rps'] / (1 + tolerance):
+                regressions.append(
+                    f'{name}: {base["rps"]} → {result["rps"]} rps')
+        if regressions:
+            raise CommandError('Замедление относительно базового прогона:\n'
+                               + '\n'.join(regressions))
+        self.stdout.write('Замедлений относительно базового прогона нет')
@@ -0,0 +1,81 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, login
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts.management.commands.benchmark import percentile
+from posts.models import Follow
+
+User = get_user_model()
+
+ENGINES = ('db', 'cached_db', 'cache', 'signed_cookies')
+
+
+def _view(request):
+    # Как любое представление ленты: пользователь берётся из сессии
+    return HttpResponse(str(request.user.pk))
+
+
+class Command(BaseCommand):
+    help = ('Накладные расходы сессии на запрос вошедшего пользователя '
+            'для разных SESSION_ENGINE: SessionMiddleware и '
+            'AuthenticationMiddleware вокруг пустого представления, '
+            'перцентили задержки и запросы к базе на запрос')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--engines', nargs='*', default=ENGINES,
+                            choices=ENGINES)
+
+    def handle(self, *args, **options):
+        follow = Follow.objects.select_related('user').order_by('-pk').first()
+        user = follow.user if follow else User.objects.first()
+        if user is None:
+            raise CommandError('Нет данных: запустите generate_data')
+        for engine in options['engines']:
+            path = f'django.contrib.sessions.backends.{engine}'
+            with override_settings(SESSION_ENGINE=path):
+                self.report(engine, self.run(user, options['requests']))
+
+    def run(self, user, requests):
+        factory = RequestFactory()
+        handler = SessionMiddleware(AuthenticationMiddleware(_view))
+        # Вход: сессия сохраняется, как после формы логина
+        request = factory.get('/')
+        SessionMiddleware(lambda request: None).process_request(request)
+        request.user = None
+        login(request, user,
+              backend='django.contrib.auth.backends.ModelBackend')
+        request.session.save()
+        cookie = request.session.session_key
+        samples = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(requests):
+                request = factory.get('/')
+                request.COOKIES[settings.SESSION_COOKIE_NAME] = cookie
+                started = time.perf_counter()
+                response = handler(request)
+                samples.append((time.perf_counter() - started) * 1000)
+                if response.content != str(user.pk).encode():
+                    raise CommandError('Сессия не прочиталась')
+        request.session.delete()
+        samples.sort()
+        return {
+            'p50': percentile(samples, 50),
+            'p99': percentile(samples, 99),
+            'queries': len(queries) / requests,
+        }
+
+    def report(self, engine, result):
+        self.stdout.write(
+            f'{engine:<16} p50 {result["p50"]:>7.3f} мс  '
+            f'p99 {result["p99"]:>7.3f} мс  '
+            f'запросов к базе {result["queries"]:.2f}'
+        )
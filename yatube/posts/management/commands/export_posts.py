@@ -0,0 +1,22 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts.ndjson import export_records, open_stream
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии и подписки в NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-',
+                            help='Файл (.gz — со сжатием) или - для stdout')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        exported = 0
+        with open_stream(options['output'], 'w') as stream:
+            for record in export_records(options['chunk_size']):
+                stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+                exported += 1
+        self.stderr.write(f'Выгружено записей: {exported}')
@@ -0,0 +1,67 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import get_thumbnail
+
+from posts import thumbnails
+from posts.models import Post
+from posts.paginator import POSTS_PER_PAGE
+
+# Одна обрезка 960x339 в JPEG, как раньше отдавали ленты
+LEGACY_GEOMETRY = '960x339'
+LEGACY_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def _size(image_file):
+    return default_storage.size(image_file.name)
+
+
+def _choose(found, needed):
+    # Как браузер по srcset: самый узкий вариант не уже нужного,
+    # WebP, если он есть
+    by_format = {}
+    for variant in found:
+        by_format.setdefault(variant.format, []).append(variant)
+    candidates = by_format.get('WEBP') or by_format['JPEG']
+    wide = [variant for variant in candidates if variant.width >= needed]
+    if wide:
+        return min(wide, key=lambda variant: variant.width)
+    return max(candidates, key=lambda variant: variant.width)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает объём картинок на странице ленты: одна обрезка '
+            '960x339 против вариантов из srcset')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=1)
+        parser.add_argument('--viewport', type=int,
+                            default=thumbnails.CARD_WIDTH,
+                            help='Ширина картинки на экране в CSS-пикселях')
+        parser.add_argument('--dpr', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        needed = min(options['viewport'], thumbnails.CARD_WIDTH)
+        needed = round(needed * options['dpr'])
+        posts = (Post.objects.exclude(image='').order_by('-pub_date', '-pk')
+                 .only('image')[:POSTS_PER_PAGE * options['pages']])
+        before = after = original = 0
+        for post in posts:
+            name = post.image.name
+            legacy = get_thumbnail(name, LEGACY_GEOMETRY, **LEGACY_OPTIONS)
+            thumbnails.generate(name)
+            found = thumbnails.variants(post.image)
+            if not found:
+                continue
+            original += default_storage.size(name)
+            before += _size(legacy)
+            after += _size(_choose(found, needed).thumbnail)
+        if not before:
+            self.stdout.write('В ленте нет картинок')
+            return
+        self.stdout.write(
+            f'Картинок на {options["pages"]} стр.: '
+            f'оригиналы {original / 1024:.1f} КБ, '
+            f'до {before / 1024:.1f} КБ, после {after / 1024:.1f} КБ '
+            f'({(after - before) / before:+.0%}) '
+            f'для {needed}px, форматы: {", ".join(thumbnails.formats())}'
+        )
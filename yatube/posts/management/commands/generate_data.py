@@ -0,0 +1,163 @@
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import search
+from posts.bulk import finish_load, manual_dates
+from posts.models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'котик собака крыша утро вечер город лес река море дом книга музыка '
+    'кофе чай дождь снег солнце дорога поезд друг работа отпуск фото '
+    'прогулка парк кино новость праздник рецепт сад весна лето осень зима'
+).split()
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетические данные для нагрузочных тестов: '
+            'пользователей, посты, граф подписок со степенным '
+            'распределением и комментарии')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Среднее число подписок пользователя')
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='Показатель степенного закона '
+                                 'популярности авторов')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней раскидать посты')
+        parser.add_argument('--prefix', default='bench',
+                            help='Префикс имён пользователей и групп')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        self.now = timezone.now()
+        self.days = options['days']
+        user_ids = self.create_users(options['users'])
+        group_ids = self.create_groups(options['groups'])
+        # Популярность автора ~ 1 / rank^alpha: немного «звёзд» и
+        # длинный хвост, как в настоящих соцсетях
+        weights = list(accumulate(
+            1 / rank ** options['alpha']
+            for rank in range(1, len(user_ids) + 1)
+        ))
+        with manual_dates((Post, 'pub_date'), (Comment, 'created')):
+            self.create_posts(options['posts'], user_ids, group_ids,
+                              weights)
+            self.create_follows(options['follows'], user_ids, weights)
+            self.create_comments(options['comments'], user_ids)
+        self.log('Индекс поиска')
+        search.rebuild(self.batch_size)
+        self.log('Счётчики и ленты подписок')
+        finish_load(self.authors(), self.batch_size)
+        self.log('Готово')
+
+    def log(self, message):
+        self.stdout.write(f'{timezone.now():%H:%M:%S} {message}')
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield min(self.batch_size, total - start)
+
+    def past(self):
+        return self.now - timedelta(
+            seconds=self.random.randrange(self.days * 24 * 60 * 60))
+
+    def text(self, words):
+        return ' '.join(self.random.choices(WORDS, k=words)).capitalize()
+
+    def create_users(self, total):
+        self.log(f'Пользователи: {total}')
+        start = User.objects.filter(
+            username__startswith=self.prefix).count()
+        # Один хеш на всех: хешировать 100k паролей слишком долго
+        password = make_password(None)
+        for size in self.batches(total):
+            User.objects.bulk_create(
+                User(username=f'{self.prefix}{start + i}',
+                     password=password)
+                for i in range(size)
+            )
+            start += size
+        return list(User.objects.filter(username__startswith=self.prefix)
+                    .order_by('pk').values_list('pk', flat=True))
+
+    def create_groups(self, total):
+        Group.objects.bulk_create(
+            [Group(title=f'Группа {self.prefix} {i}',
+                   slug=f'{self.prefix}-{i}',
+                   description=self.text(10))
+             for i in range(total)],
+            ignore_conflicts=True,
+        )
+        return list(Group.objects.filter(slug__startswith=self.prefix)
+                    .values_list('pk', flat=True))
+
+    def last_post_pk(self):
+        return Post.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def create_posts(self, total, user_ids, group_ids, weights):
+        self.log(f'Посты: {total}')
+        first = self.last_post_pk() + 1
+        for size in self.batches(total):
+            authors = self.random.choices(user_ids, cum_weights=weights,
+                                          k=size)
+            Post.objects.bulk_create(
+                Post(author_id=author_id,
+                     group_id=(self.random.choice(group_ids)
+                               if group_ids and self.random.random() < 0.5
+                               else None),
+                     text=self.text(self.random.randint(5, 60)),
+                     pub_date=self.past())
+                for author_id in authors
+            )
+        # Новые посты идут подряд: комментарии выбирают pk из диапазона
+        self.post_pks = (first, self.last_post_pk())
+
+    def create_follows(self, average, user_ids, weights):
+        self.log(f'Подписки: ~{average * len(user_ids)}')
+        follows = []
+        for user_id in user_ids:
+            count = min(int(self.random.expovariate(1 / average)),
+                        len(user_ids) - 1)
+            authors = set(self.random.choices(user_ids, cum_weights=weights,
+                                              k=count))
+            authors.discard(user_id)
+            follows += [Follow(user_id=user_id, author_id=author_id)
+                        for author_id in authors]
+            if len(follows) >= self.batch_size:
+                Follow.objects.bulk_create(follows, ignore_conflicts=True)
+                follows = []
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+
+    def create_comments(self, total, user_ids):
+        self.log(f'Комментарии: {total}')
+        first, last = self.post_pks
+        if first > last:
+            return
+        for size in self.batches(total):
+            Comment.objects.bulk_create(
+                Comment(post_id=self.random.randint(first, last),
+                        author_id=self.random.choice(user_ids),
+                        text=self.text(self.random.randint(3, 20)),
+                        created=self.past())
+                for _ in range(size)
+            )
+
+    def authors(self):
+        return Follow.objects.filter(
+            user__username__startswith=self.prefix).order_by(
+            'author_id').values_list('author_id', flat=True).distinct()
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.bulk import finish_load
+from posts.ndjson import Importer, open_stream
+
+
+class Command(BaseCommand):
+    help = ('Загружает NDJSON из export_posts пачками; прерванную загрузку '
+            'можно продолжить с checkpoint')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input',
+                            help='Файл (.gz — со сжатием) или - для stdin')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--checkpoint',
+                            help='Файл прогресса; по умолчанию '
+                                 '<input>.checkpoint')
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        if checkpoint is None and options['input'] != '-':
+            checkpoint = options['input'] + '.checkpoint'
+        importer = Importer(checkpoint, options['batch_size'])
+        if importer.state['line']:
+            self.stdout.write(
+                f'Продолжаем со строки {importer.state["line"] + 1}')
+        started = time.monotonic()
+        with open_stream(options['input'], 'r') as stream:
+            loaded = importer.run(stream)
+        self.stdout.write('Счётчики и ленты подписок')
+        finish_load(batch_size=options['batch_size'])
+        importer.finish()
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Загружено записей: {loaded} за {elapsed:.1f} с '
+            f'({loaded / max(elapsed, 0.001):.0f} в секунду)')
@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+def generate(name):
+    try:
+        thumbnails.generate(name)
+    finally:
+        # Соединения с БД у каждого потока пула свои
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры для уже загруженных картинок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        if not default_storage.exists('posts'):
+            self.stdout.write('Картинок нет')
+            return
+        _, files = default_storage.listdir('posts')
+        names = [f'posts/{name}' for name in files]
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            # Уже готовые миниатюры sorl найдёт в хранилище и не пересоздаст
+            list(pool.map(generate, names))
+        self.stdout.write(f'Обработано картинок: {len(names)}')
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает «Популярное» по постам и комментариям, '
+            'появившимся с прошлого прогона')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=float,
+                            help='Повторять каждые столько секунд, как '
+                                 'фоновый воркер; без него — один прогон')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            touched = trending.update(options['batch_size'])
+            self.stdout.write(
+                f'Постов с новой активностью: {touched}, '
+                f'{(time.perf_counter() - started) * 1000:.0f} мс')
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает индекс поиска по постам: после миграции '
+            '0009_search или смены SEARCH_BACKEND')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild(options['batch_size'])
+        self.stdout.write(
+            f'Проиндексировано постов: {indexed} ({search.backend()})')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики постов, подписок '
+            'и групп')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        authors = counters.reconcile_authors(batch_size)
+        posts = counters.reconcile_posts(batch_size)
+        groups = counters.reconcile_groups()
+        self.stdout.write(
+            f'Исправлено счётчиков: пользователей {authors}, постов {posts}'
+            f', групп {groups}'
+        )
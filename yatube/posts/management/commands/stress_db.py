@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import (OperationalError, connection, connections,
+                       transaction)
+
+from posts.management.commands.benchmark import percentile
+from posts.models import Comment, Post, User
+
+# Посты нагрузки помечаются этим префиксом и удаляются в конце
+STRESS_PREFIX = '[stress]'
+
+
+class Command(BaseCommand):
+    help = ('Смешанная нагрузка чтения и записи на базу из нескольких '
+            'процессов, как у воркеров gunicorn: операции в секунду, '
+            'задержки записи и ошибки «database is locked». --compare '
+            'прогоняет её на копии базы со стандартным SQLite и с '
+            'SQLITE_TUNING')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--write-ratio', type=float, default=0.2,
+                            help='Доля операций записи')
+        parser.add_argument('--compare', action='store_true',
+                            help='Сравнить режимы на временной копии базы')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Нагрузка рассчитана на SQLite')
+        if options['compare']:
+            self.compare(options)
+            return
+        author_ids = list(User.objects.order_by('?').values_list(
+            'pk', flat=True)[:100])
+        post_ids = list(Post.objects.order_by('-pk').values_list(
+            'pk', flat=True)[:1000])
+        if not author_ids or not post_ids:
+            raise CommandError('Нет данных: запустите generate_data')
+        # Дочерние процессы открывают свои соединения
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        deadline = time.time() + options['seconds']
+        processes = [
+            context.Process(target=self.worker, args=(
+                deadline, options['write_ratio'], author_ids, post_ids,
+                queue))
+            for _ in range(options['processes'])
+        ]
+        started = time.time()
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        self.report(results, time.time() - started)
+        Post.objects.filter(text__startswith=STRESS_PREFIX).delete()
+
+    def worker(self, deadline, write_ratio, author_ids, post_ids, queue):
+        stats = {'reads': 0, 'writes': [], 'locked': 0}
+        rng = random.Random()
+        try:
+            while time.time() < deadline:
+                try:
+                    if rng.random() < write_ratio:
+                        started = time.perf_counter()
+                        self.write(rng, author_ids, post_ids)
+                        stats['writes'].append(
+                            (time.perf_counter() - started) * 1000)
+                    else:
+                        self.read(rng, post_ids)
+                        stats['reads'] += 1
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    stats['locked'] += 1
+        finally:
+            connection.close()
+            queue.put(stats)
+
+    def read(self, rng, post_ids):
+        list(Post.objects.for_feed()[:10])
+        list(Comment.objects.for_post_page().filter(
+            post_id=rng.choice(post_ids))[:50])
+
+    def write(self, rng, author_ids, post_ids):
+        # Запись и счётчики в одной транзакции, как в post_create и
+        # add_comment; транзакция сначала читает, потом пишет
+        with transaction.atomic():
+            post = Post.objects.only('pk').get(pk=rng.choice(post_ids))
+            if rng.random() < 0.5:
+                Post.objects.create(author_id=rng.choice(author_ids),
+                                    text=f'{STRESS_PREFIX} пост')
+            else:
+                Comment.objects.create(post=post,
+                                       author_id=rng.choice(author_ids),
+                                       text=f'{STRESS_PREFIX} комментарий')
+
+    def report(self, results, elapsed):
+        reads = sum(stats['reads'] for stats in results)
+        writes = sorted(ms for stats in results for ms in stats['writes'])
+        locked = sum(stats['locked'] for stats in results)
+        self.stdout.write(
+            f'чтений {reads / elapsed:.1f}/с  записей '
+            f'{len(writes) / elapsed:.1f}/с  запись p50 '
+            f'{percentile(writes, 50):.1f} мс  p99 '
+            f'{percentile(writes, 99):.1f} мс  database is locked: {locked}'
+        )
+
+    def compare(self, options):
+        """Прогоны в дочерних процессах на свежих копиях базы: PRAGMA
+        journal_mode хранится в самом файле базы."""
+        source = settings.DATABASES['default']['NAME']
+        for tuning in ('0', '1'):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'stress.sqlite3')
+                with sqlite3.connect(source) as src, \
+                        sqlite3.connect(path) as dst:
+                    src.backup(dst)
+                    dst.execute('PRAGMA journal_mode = delete')
+                result = subprocess.run(
+                    [sys.executable,
+                     os.path.join(settings.BASE_DIR, 'manage.py'),
+                     'stress_db',
+                     '--seconds', str(options['seconds']),
+                     '--processes', str(options['processes']),
+                     '--write-ratio', str(options['write_ratio'])],
+                    env={**os.environ, 'SQLITE_TUNING': tuning,
+                         'SQLITE_PATH': path, 'TASKS_BACKEND':
+                         'core.tasks.ImmediateBackend'},
+                    check=True, capture_output=True, text=True,
+                )
+                self.stdout.write(f'SQLITE_TUNING={tuning}  '
+                                  + result.stdout.strip())
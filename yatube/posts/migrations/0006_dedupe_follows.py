@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def dedupe_follows(apps, schema_editor):
+    """Удаляет повторные подписки перед добавлением unique(user, author)."""
+    Follow = apps.get_model('posts', 'Follow')
+    duplicates = (
+        Follow.objects.values('user', 'author')
+        .annotate(keep=Min('pk'), rows=Count('pk'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates.iterator():
+        Follow.objects.filter(
+            user=row['user'], author=row['author']
+        ).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_timelineentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_follows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    stats = {}
+
+    def add(rows, field):
+        for user_id, count in rows:
+            stats.setdefault(user_id, AuthorStats(user_id=user_id))
+            setattr(stats[user_id], field, count)
+
+    add(Post.objects.order_by().values('author').annotate(n=Count('pk'))
+        .values_list('author', 'n'), 'posts_count')
+    add(Follow.objects.values('author').annotate(n=Count('pk'))
+        .values_list('author', 'n'), 'followers_count')
+    add(Follow.objects.values('user').annotate(n=Count('pk'))
+        .values_list('user', 'n'), 'following_count')
+    AuthorStats.objects.bulk_create(stats.values(), batch_size=500)
+    for post in Post.objects.order_by().annotate(n=Count('comments')).filter(n__gt=0):
+        Post.objects.filter(pk=post.pk).update(comments_count=post.n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0007_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
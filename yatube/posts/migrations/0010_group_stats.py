@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def fill_group_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    GroupAuthor = apps.get_model('posts', 'GroupAuthor')
+    authors = [
+        GroupAuthor(group_id=group_id, author_id=author_id, posts_count=n)
+        for group_id, author_id, n in Post.objects.filter(group__isnull=False)
+        .order_by().values('group', 'author').annotate(n=Count('pk'))
+        .values_list('group', 'author', 'n')
+    ]
+    GroupAuthor.objects.bulk_create(authors, batch_size=500)
+    stats = {group_id: GroupStats(group_id=group_id)
+             for group_id in Group.objects.values_list('pk', flat=True)}
+    for group_id, n, last in (
+            Post.objects.filter(group__isnull=False).order_by()
+            .values('group').annotate(n=Count('pk'), last=Max('pub_date'))
+            .values_list('group', 'n', 'last')):
+        stats[group_id].posts_count = n
+        stats[group_id].last_post_at = last
+    for row in authors:
+        stats[row.group_id].authors_count += 1
+    GroupStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('authors_count', models.PositiveIntegerField(default=0, verbose_name='Авторов')),
+                ('last_post_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний пост')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupAuthor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_counts', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_counts', to='posts.Group')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='groupauthor',
+            constraint=models.UniqueConstraint(fields=('group', 'author'), name='unique_group_author'),
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
@@ -15,6 +15,12 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа выбираются тем же запросом."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст поста',
                             help_text='Введите текст поста')
@@ -43,6 +49,15 @@ class Post(models.Model):
         null=True,
     )
 
+    # Поддерживается сигналами, см. posts/counters.py
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
+
     def __str__(self):
         return self.text[:15]
 
@@ -50,6 +65,22 @@ class Post(models.Model):
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_post_page(self):
+        """Комментарии под постом: только то, что выводит шаблон."""
+        return self.select_related('author').only(
+            'text', 'created', 'post', 'author__username'
+        ).order_by('created', 'pk')
 
 
 class Comment(models.Model):
@@ -75,6 +106,14 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
 
@@ -89,3 +128,130 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+
+    # Копия post.pub_date, чтобы лента читалась по индексу (user, pub_date)
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_feed_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики пользователя, которые поддерживаются при записи."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0,
+                                                  db_index=True)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+
+class GroupStats(models.Model):
+    """Сводка группы для каталога, поддерживается при записи постов."""
+
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    authors_count = models.PositiveIntegerField('Авторов', default=0)
+    last_post_at = models.DateTimeField('Последний пост', null=True,
+                                        blank=True)
+
+
+class GroupAuthor(models.Model):
+    """Сколько постов автора в группе: по этим строкам ведётся
+    ``GroupStats.authors_count`` без ``COUNT(DISTINCT)``."""
+
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='author_counts'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='group_counts'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'author'],
+                                    name='unique_group_author'),
+        ]
+
+
+class TrendingPost(models.Model):
+    """Ранжированный список «Популярного», его пишет posts/trending.py."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending'
+    )
+    # Логарифм затухающей активности, приведённый к общей эпохе
+    score = models.FloatField('Рейтинг', db_index=True)
+
+
+class TrendingCursor(models.Model):
+    """До какого pk постов и комментариев дошёл пересчёт рейтинга."""
+
+    name = models.CharField(max_length=32, primary_key=True)
+    last_pk = models.PositiveIntegerField(default=0)
+
+
+class SearchTerm(models.Model):
+    """Инвертированный индекс поиска для СУБД без FTS5 (posts/search.py)."""
+
+    term = models.CharField('Основа слова', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms'
+    )
+    weight = models.PositiveIntegerField('Частота в посте', default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'post'],
+                         name='search_term_post_idx'),
+        ]
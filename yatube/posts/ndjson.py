@@ -0,0 +1,229 @@
+"""Потоковый обмен данными в формате NDJSON (по объекту JSON в строке).
+
+Каждая строка — запись с полем ``type``: ``group``, ``post``,
+``comment`` или ``follow``. Внешние ключи записываются по username
+пользователя и slug группы, посты и комментарии — по своим ``id`` в
+исходной базе. Файлы с расширением ``.gz`` сжимаются gzip.
+"""
+import gzip
+import io
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import search
+from .bulk import manual_dates
+from .models import Comment, Follow, Group, Post, User
+
+
+@contextmanager
+def open_stream(path, mode):
+    """Файл, gzip-файл или stdin/stdout для ``-``; текст в UTF-8."""
+    if path == '-':
+        std = sys.stdin if 'r' in mode else sys.stdout
+        stream = io.TextIOWrapper(std.buffer, encoding='utf-8')
+        try:
+            yield stream
+        finally:
+            if 'w' in mode:
+                stream.flush()
+            # Не закрываем сам stdin/stdout
+            stream.detach()
+        return
+    if path.endswith('.gz'):
+        stream = gzip.open(path, mode + 't', encoding='utf-8')
+    else:
+        stream = open(path, mode, encoding='utf-8')
+    with stream:
+        yield stream
+
+
+def export_records(chunk_size=2000):
+    """Все записи для выгрузки; строки читаются из БД пачками."""
+    groups = Group.objects.order_by('pk').values_list(
+        'slug', 'title', 'description')
+    for slug, title, description in groups.iterator(chunk_size=chunk_size):
+        yield {'type': 'group', 'slug': slug, 'title': title,
+               'description': description}
+    posts = Post.objects.order_by('pk').values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date', 'image')
+    for pk, author, group, text, pub_date, image in posts.iterator(
+            chunk_size=chunk_size):
+        yield {'type': 'post', 'id': pk, 'author': author, 'group': group,
+               'text': text, 'pub_date': pub_date.isoformat(),
+               'image': image or None}
+    comments = Comment.objects.order_by('pk').values_list(
+        'pk', 'post_id', 'author__username', 'text', 'created')
+    for pk, post, author, text, created in comments.iterator(
+            chunk_size=chunk_size):
+        yield {'type': 'comment', 'id': pk, 'post': post, 'author': author,
+               'text': text, 'created': created.isoformat()}
+    follows = Follow.objects.order_by('pk').values_list(
+        'user__username', 'author__username')
+    for user, author in follows.iterator(chunk_size=chunk_size):
+        yield {'type': 'follow', 'user': user, 'author': author}
+
+
+class Importer:
+    """Загрузка NDJSON пачками через ``bulk_create``.
+
+    Посты и комментарии получают ``id`` = сдвиг + ``id`` в источнике,
+    поэтому комментарии находят свои посты без таблицы соответствия, а
+    повторная загрузка пачки после сбоя пропускается как конфликт.
+    Сдвиги и номер последней загруженной строки хранятся в checkpoint.
+    """
+
+    def __init__(self, checkpoint=None, batch_size=5000):
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.users = {}
+        self.groups = {}
+        self.state = self.load_state()
+        self.loaders = {
+            'group': self.load_groups,
+            'post': self.load_posts,
+            'comment': self.load_comments,
+            'follow': self.load_follows,
+        }
+
+    def load_state(self):
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as file:
+                return json.load(file)
+        return {
+            'line': 0,
+            'post_offset': self._max_pk(Post),
+            'comment_offset': self._max_pk(Comment),
+        }
+
+    def _max_pk(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def save_state(self):
+        if not self.checkpoint:
+            return
+        with open(f'{self.checkpoint}.tmp', 'w') as file:
+            json.dump(self.state, file)
+        os.replace(f'{self.checkpoint}.tmp', self.checkpoint)
+
+    def run(self, stream):
+        """Загружает строки после checkpoint; возвращает их число."""
+        done = self.state['line']
+        loaded = 0
+        batch, kind = [], None
+        with manual_dates((Post, 'pub_date'), (Comment, 'created')):
+            for number, line in enumerate(stream, 1):
+                if number <= done or not line.strip():
+                    continue
+                record = json.loads(line)
+                if batch and (record['type'] != kind
+                              or len(batch) >= self.batch_size):
+                    self.flush(kind, batch, number - 1)
+                    loaded += len(batch)
+                    batch = []
+                kind = record['type']
+                batch.append(record)
+            if batch:
+                self.flush(kind, batch, number)
+                loaded += len(batch)
+        self.reset_sequences()
+        return loaded
+
+    def flush(self, kind, records, line):
+        with transaction.atomic():
+            self.loaders[kind](records)
+        self.state['line'] = line
+        self.save_state()
+
+    def user_ids(self, usernames):
+        missing = {name for name in usernames if name not in self.users}
+        if missing:
+            self.users.update(User.objects.filter(
+                username__in=missing).values_list('username', 'pk'))
+            new = missing - self.users.keys()
+            if new:
+                password = make_password(None)
+                User.objects.bulk_create(
+                    [User(username=name, password=password)
+                     for name in new],
+                    ignore_conflicts=True,
+                )
+                self.users.update(User.objects.filter(
+                    username__in=new).values_list('username', 'pk'))
+        return self.users
+
+    def group_ids(self, slugs):
+        missing = {slug for slug in slugs
+                   if slug is not None and slug not in self.groups}
+        if missing:
+            self.groups.update(Group.objects.filter(
+                slug__in=missing).values_list('slug', 'pk'))
+        return self.groups
+
+    def load_groups(self, records):
+        Group.objects.bulk_create(
+            [Group(slug=record['slug'], title=record['title'],
+                   description=record['description'])
+             for record in records],
+            ignore_conflicts=True,
+        )
+
+    def load_posts(self, records):
+        users = self.user_ids(record['author'] for record in records)
+        groups = self.group_ids(record['group'] for record in records)
+        offset = self.state['post_offset']
+        posts = [
+            Post(pk=offset + record['id'],
+                 author_id=users[record['author']],
+                 group_id=groups.get(record['group']),
+                 text=record['text'],
+                 pub_date=parse_datetime(record['pub_date']),
+                 image=record['image'] or '')
+            for record in records
+        ]
+        Post.objects.bulk_create(posts, ignore_conflicts=True)
+        search.index_posts(posts)
+
+    def load_comments(self, records):
+        users = self.user_ids(record['author'] for record in records)
+        post_offset = self.state['post_offset']
+        offset = self.state['comment_offset']
+        Comment.objects.bulk_create(
+            [Comment(pk=offset + record['id'],
+                     post_id=post_offset + record['post'],
+                     author_id=users[record['author']],
+                     text=record['text'],
+                     created=parse_datetime(record['created']))
+             for record in records],
+            ignore_conflicts=True,
+        )
+
+    def load_follows(self, records):
+        users = self.user_ids(
+            name for record in records
+            for name in (record['user'], record['author']))
+        Follow.objects.bulk_create(
+            [Follow(user_id=users[record['user']],
+                    author_id=users[record['author']])
+             for record in records],
+            ignore_conflicts=True,
+        )
+
+    def reset_sequences(self):
+        # После явных id (PostgreSQL и др.) счётчик id должен их обогнать
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comment])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def finish(self):
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
@@ -0,0 +1,176 @@
+"""Кеш страниц целиком для анонимных посетителей.
+
+Анонимы без cookie сессии видят на ``PAGE_CACHE_VIEWS`` одинаковый HTML.
+С ``settings.PAGE_CACHE`` такие ответы сохраняются в кеш вместе с
+поколениями областей (``posts/feed_cache.py``), из которых страница
+собрана. Повторный запрос проверяет поколения одним ``get_many`` и
+отдаёт сохранённую страницу, не доходя до сессий, CSRF и представления.
+Запись в любую из областей делает страницу устаревшей.
+
+Ответы получают ``Cache-Control: public, max-age=0, s-maxage=…`` и
+ETag, поэтому их может кешировать и обратный прокси перед сайтом. Прокси
+должен обходить кеш для запросов с cookie сессии: ``Vary: Cookie`` из
+таких ответов убран, иначе прокси хранил бы копию на каждую cookie.
+Страницы для вошедших пользователей помечаются ``private``. При записи
+поста прокси из ``PAGE_CACHE_PURGE_URLS`` получают запросы PURGE на
+затронутые адреса.
+"""
+import hashlib
+import logging
+import time
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve, reverse
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control)
+from django.utils.http import http_date
+
+from core import db_router
+from core.tasks import task
+
+from .feed_cache import generations
+
+logger = logging.getLogger(__name__)
+
+# Заголовки, которые сохраняются вместе со страницей. Промежуточные слои
+# стоят после этого, поэтому заголовки защиты от SecurityMiddleware и
+# XFrameOptionsMiddleware ответ из кеша получает только отсюда
+STORED_HEADERS = (
+    'Content-Type', 'Content-Language', 'X-Frame-Options',
+    'X-Content-Type-Options', 'X-XSS-Protection',
+    'Strict-Transport-Security', 'Referrer-Policy',
+)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+    return match.view_name
+
+
+def _anonymous(request):
+    return not any(name in request.COOKIES
+                   for name in settings.PAGE_CACHE_BYPASS_COOKIES)
+
+
+def _key(request):
+    url = request.build_absolute_uri()
+    return 'page:' + hashlib.md5(url.encode()).hexdigest()
+
+
+def _public(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=0,
+                        s_maxage=settings.PAGE_CACHE_SECONDS)
+    vary = [value.strip() for value in response.get('Vary', '').split(',')
+            if value.strip() and value.strip().lower() != 'cookie']
+    if vary:
+        response['Vary'] = ', '.join(vary)
+    elif response.has_header('Vary'):
+        del response['Vary']
+    return response
+
+
+class AnonymousPageCacheMiddleware:
+    """Должна стоять до ``SessionMiddleware`` в ``MIDDLEWARE``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (not settings.PAGE_CACHE
+                or _view_name(request) not in settings.PAGE_CACHE_VIEWS):
+            return self.get_response(request)
+        if request.method != 'GET' or not _anonymous(request):
+            response = self.get_response(request)
+            patch_cache_control(response, private=True)
+            return response
+        key = _key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            response = self.cached_response(request, entry)
+            if response is not None:
+                return response
+        response = self.get_response(request)
+        self.store(request, response, key)
+        return response
+
+    def cached_response(self, request, entry):
+        scopes, stored, etag, last_modified, content, headers = entry
+        if generations(*scopes) != stored:
+            return None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(content)
+        for name, value in headers:
+            response[name] = value
+        return _public(response, etag, last_modified)
+
+    def store(self, request, response, key):
+        # Страница без фрагментов с поколениями не знает, когда устареет
+        current = getattr(request, 'page_generations', None)
+        if (response.status_code != 200 or response.streaming
+                or response.cookies or not current or db_router.wrote()):
+            return
+        etag = '"%s"' % hashlib.md5(response.content).hexdigest()
+        last_modified = int(time.time())
+        headers = [(name, response[name]) for name in STORED_HEADERS
+                   if response.has_header(name)]
+        scopes = list(current)
+        cache.set(
+            key,
+            (scopes, [current[scope] for scope in scopes], etag,
+             last_modified, response.content, headers),
+            settings.REPLICA_CACHE_TIMEOUT if db_router.using_replica()
+            else settings.PAGE_CACHE_TIMEOUT,
+        )
+        _public(response, etag, last_modified)
+
+
+@task
+def purge_urls(paths):
+    """PURGE адресов на обратных прокси; query-варианты (страницы
+    ленты) прокси сбрасывает по префиксу пути."""
+    for base in settings.PAGE_CACHE_PURGE_URLS:
+        for path in paths:
+            try:
+                urlopen(Request(base.rstrip('/') + path, method='PURGE'),
+                        timeout=5).close()
+            except (URLError, OSError) as error:
+                logger.warning('PURGE %s%s: %s', base, path, error)
+
+
+def post_paths(post, group_ids=()):
+    """Адреса страниц, на которых виден пост."""
+    from .models import Group
+
+    paths = [
+        reverse('posts:index'),
+        reverse('posts:profile', args=[post.author.username]),
+        reverse('posts:post_detail', args=[post.pk]),
+    ]
+    slugs = Group.objects.filter(
+        pk__in={post.group_id, *group_ids} - {None}
+    ).values_list('slug', flat=True)
+    return paths + [reverse('posts:group_posts', args=[slug])
+                    for slug in slugs]
+
+
+def purge_post(post, group_ids=()):
+    if settings.PAGE_CACHE_PURGE_URLS:
+        purge_urls.enqueue(post_paths(post, group_ids))
+
+
+def purge_comments(post_id):
+    if settings.PAGE_CACHE_PURGE_URLS:
+        purge_urls.enqueue([reverse('posts:post_detail', args=[post_id])])
@@ -0,0 +1,257 @@
+"""Курсорная (keyset) пагинация лент постов.
+
+Вместо ``COUNT(*)`` и ``OFFSET n LIMIT 10`` страница выбирается условием
+``(pub_date, id) < (последний показанный пост)``, поэтому стоимость
+любой страницы одинакова. Старые ссылки ``?page=N`` продолжают работать
+для первых ``OFFSET_PAGES_LIMIT`` страниц, где OFFSET ещё дёшев.
+"""
+import datetime as dt
+from math import ceil, isfinite
+from urllib.parse import urlencode
+
+from django.core.paginator import Page, Paginator
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+POSTS_PER_PAGE = 10
+# Комментарии под постом: старые сверху
+COMMENTS_PER_PAGE = 50
+COMMENT_ORDERING = ('created', 'pk')
+# Страницы с номером до этого значения можно открыть по ?page=N (OFFSET)
+OFFSET_PAGES_LIMIT = 10
+# Сколько номеров страниц показывать по обе стороны от текущей
+PAGE_WINDOW = 2
+
+EPOCH = dt.datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = dt.timedelta(microseconds=1)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPaginator(Paginator):
+    """Paginator, который не считает общее количество объектов.
+
+    ``num_pages`` — это известный «горизонт»: номер текущей страницы плюс
+    одна, если за ней ещё есть объекты. Страницы, которые отдаёт
+    ``get_page``, — обычные ``django.core.paginator.Page`` с
+    дополнительными атрибутами ``first_query``, ``next_query``,
+    ``previous_query``, ``last_query`` и ``page_links`` для шаблона
+    ``posts/includes/paginator.html``.
+    ``params`` добавляются во все ссылки (например, строка поиска).
+
+    ``count`` — число объектов из хранимого счётчика, если он есть. С ним
+    известна последняя страница: она выбирается с конца ленты, тоже
+    без OFFSET.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 params=None, count=None):
+        self.ordering = tuple(ordering)
+        self.params = dict(params or {})
+        self.keys = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+        self.horizon = 1
+        self.last_number = None
+        if count is not None:
+            # Подменяем cached_property: COUNT(*) не нужен
+            self.count = count
+            self.last_number = max(1, ceil(count / per_page))
+
+    @property
+    def num_pages(self):
+        return self.horizon
+
+    def get_page(self, number=None, after=None, before=None, last=False):
+        if last and self.last_number:
+            return self._page_last()
+        try:
+            if after:
+                return self._page_after(self.decode_cursor(after), number)
+            if before:
+                return self._page_before(self.decode_cursor(before), number)
+        except InvalidCursor:
+            pass
+        return self._page_at(number)
+
+    def encode_cursor(self, obj):
+        parts = []
+        for name, _ in self.keys:
+            # Строки values() — словари
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            if isinstance(value, dt.datetime):
+                value = (value - EPOCH) // MICROSECOND
+            parts.append(str(value))
+        return '_'.join(parts)
+
+    def decode_cursor(self, cursor):
+        parts = str(cursor).split('_')
+        if len(parts) != len(self.keys):
+            raise InvalidCursor(cursor)
+        values = []
+        for (name, _), part in zip(self.keys, parts):
+            field = self._field(name)
+            try:
+                if isinstance(field, models.FloatField):
+                    value = float(part)
+                else:
+                    value = int(part)
+            except ValueError:
+                raise InvalidCursor(cursor)
+            if not isfinite(value):
+                raise InvalidCursor(cursor)
+            if isinstance(field, models.DateTimeField):
+                value = EPOCH + value * MICROSECOND
+            values.append(value)
+        return values
+
+    def _field(self, name):
+        annotations = self.object_list.query.annotations
+        if name in annotations:
+            return annotations[name].output_field
+        opts = self.object_list.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def _seek(self, values, backwards=False):
+        """Условие «строго после курсора» в порядке сортировки ленты."""
+        condition = None
+        equal = {}
+        for (name, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            step = Q(**equal, **{f'{name}__{lookup}': value})
+            condition = step if condition is None else condition | step
+            equal[name] = value
+        return condition
+
+    def _page_at(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 1
+        number = min(max(number, 1), OFFSET_PAGES_LIMIT)
+        offset = (number - 1) * self.per_page
+        rows = list(self.object_list[offset:offset + self.per_page + 1])
+        if not rows and number > 1:
+            # Номер за концом ленты: как Paginator.get_page, отдаём последнюю
+            last = max(1, ceil(self.count / self.per_page))
+            return self._page_at(min(last, number - 1))
+        return self._build(rows, number, len(rows) > self.per_page)
+
+    def _page_after(self, values, number):
+        rows = list(
+            self.object_list.filter(self._seek(values))[:self.per_page + 1]
+        )
+        try:
+            number = max(int(number), 2)
+        except (TypeError, ValueError):
+            number = 2
+        return self._build(rows, number, len(rows) > self.per_page)
+
+    def _page_before(self, values, number):
+        reverse = [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+        rows = list(
+            self.object_list.filter(self._seek(values, backwards=True))
+            .order_by(*reverse)[:self.per_page + 1]
+        )
+        if not rows:
+            return self._page_at(1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        try:
+            number = int(number) if has_more else 1
+        except (TypeError, ValueError):
+            number = 2
+        return self._build(rows, max(number, 1 + has_more), True)
+
+    def _page_last(self):
+        # На последней странице остаток от деления, а не полная страница
+        size = self.count - (self.last_number - 1) * self.per_page
+        rows = list(self.object_list.reverse()[:max(size, 1)])[::-1]
+        if self.last_number == 1 or not rows:
+            return self._page_at(1)
+        return self._build(rows, self.last_number, False)
+
+    def _build(self, rows, number, has_next):
+        rows = rows[:self.per_page]
+        self.horizon = number + 1 if has_next else number
+        page = Page(rows, number, self)
+        page.first_query = self._query({'page': 1})
+        page.next_query = page.previous_query = None
+        if has_next:
+            page.next_query = self._query({
+                'page': number + 1,
+                'after': self.encode_cursor(rows[-1]),
+            })
+        if number == 2:
+            page.previous_query = page.first_query
+        elif number > 2:
+            page.previous_query = self._query({
+                'page': number - 1,
+                'before': self.encode_cursor(rows[0]),
+            })
+        page.last_query = None
+        if self.last_number and number < self.last_number:
+            page.last_query = self._query(
+                {'page': self.last_number, 'last': 1})
+        page.page_links = self._page_links(page)
+        return page
+
+    def _query(self, params):
+        return urlencode({**self.params, **params})
+
+    def _page_links(self, page):
+        """Окно номеров вокруг текущей страницы, первая и последняя.
+
+        Ссылки есть только на страницы, которые дёшево открыть: по
+        номеру в пределах ``OFFSET_PAGES_LIMIT``, соседние по курсору и
+        последнюю. Пропуски отмечены парой ``(None, None)``, у текущей
+        страницы ссылки нет.
+        """
+        number = page.number
+        upper = number + 1
+        if self.last_number:
+            upper = max(upper, min(self.last_number, OFFSET_PAGES_LIMIT))
+        window = range(max(1, number - PAGE_WINDOW),
+                       min(number + PAGE_WINDOW, upper) + 1)
+        links = {1: page.first_query}
+        links.update(
+            (i, self._query({'page': i}))
+            for i in window if i <= OFFSET_PAGES_LIMIT
+        )
+        if page.previous_query:
+            links[number - 1] = page.previous_query
+        if page.next_query:
+            links[number + 1] = page.next_query
+        if page.last_query:
+            links[self.last_number] = page.last_query
+        links[number] = None
+        result = []
+        previous = 0
+        for i in sorted(links):
+            if i - previous > 1:
+                result.append((None, None))
+            result.append((i, links[i]))
+            previous = i
+        return result
+
+
+def paginate(request, queryset, per_page=POSTS_PER_PAGE,
+             ordering=('-pub_date', '-pk'), keep=(), count=None):
+    """Страница ленты по параметрам ``page``/``after``/``before``/``last``
+    запроса; параметры из ``keep`` сохраняются в ссылках на другие
+    страницы, ``count`` — хранимое число объектов ленты, если оно есть."""
+    params = {name: request.GET[name] for name in keep if name in request.GET}
+    paginator = KeysetPaginator(queryset, per_page, ordering, params, count)
+    return paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        last=bool(request.GET.get('last')),
+    )
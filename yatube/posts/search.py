@@ -0,0 +1,228 @@
+"""Полнотекстовый поиск по постам через инвертированный индекс.
+
+Текст поста разбивается на слова, слова приводятся к основе русским
+стеммером Портера, и основы попадают в индекс. На SQLite с FTS5 это
+виртуальная таблица ``posts_post_fts`` с ранжированием BM25, на других
+СУБД — модель ``SearchTerm`` (основа, пост, частота) с ранжированием
+TF-IDF. Сигнал сохранения поста ставит его индексирование в очередь
+задач, сигнал удаления убирает пост из индекса сразу.
+
+``search(query)`` возвращает посты с аннотацией ``rank`` (чем больше,
+тем выше), которые пагинируются курсором по ``SEARCH_ORDERING``.
+Посты, созданные до миграции ``0009_search``, попадают в индекс после
+``manage.py rebuild_search_index``.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import (Case, Count, F, FloatField, Max, Sum, Value,
+                              When)
+from django.db.models.expressions import RawSQL
+
+from core.tasks import task
+
+from .models import Post, SearchTerm
+
+FTS_TABLE = 'posts_post_fts'
+SEARCH_ORDERING = ('-rank', '-pk')
+# Больше слов в запросе не учитываем
+MAX_QUERY_TERMS = 10
+
+WORD = re.compile(r'\w+')
+
+# Русский стеммер Портера (snowball), регулярные выражения по RV-области
+RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых'
+    r'|ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем'
+    r'|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_SUFFIX = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+@lru_cache(maxsize=10000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if match is None:
+        return word
+    start, rv = match.groups()
+    stripped = PERFECTIVE_GERUND.sub('', rv, 1)
+    if stripped == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        stripped = ADJECTIVE.sub('', rv, 1)
+        if stripped != rv:
+            rv = PARTICIPLE.sub('', stripped, 1)
+        else:
+            stripped = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if stripped == rv else stripped
+    else:
+        rv = stripped
+    rv = re.sub('и$', '', rv)
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_SUFFIX.sub('', rv, 1)
+    stripped = re.sub('ь$', '', rv)
+    if stripped == rv:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        rv = re.sub('нн$', 'н', rv)
+    else:
+        rv = stripped
+    return start + rv
+
+
+def tokenize(text):
+    """Основы слов текста в порядке следования."""
+    return [stem(word) for word in WORD.findall(text.lower())]
+
+
+@lru_cache(maxsize=None)
+def _has_fts5(vendor):
+    if vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+
+def backend():
+    """``'fts5'`` или ``'python'``; ``settings.SEARCH_BACKEND`` задаёт
+    бэкенд явно."""
+    if settings.SEARCH_BACKEND:
+        return settings.SEARCH_BACKEND
+    return 'fts5' if _has_fts5(connection.vendor) else 'python'
+
+
+def index_posts(posts):
+    """Индексирует пачку постов (нужны ``pk`` и ``text``)."""
+    documents = [
+        (post.pk, [term[:64] for term in tokenize(post.text)])
+        for post in posts
+    ]
+    if not documents:
+        return
+    with transaction.atomic():
+        if backend() == 'fts5':
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                    [(pk,) for pk, _ in documents],
+                )
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                    [(pk, ' '.join(terms)) for pk, terms in documents],
+                )
+            return
+        SearchTerm.objects.filter(
+            post_id__in=[pk for pk, _ in documents]).delete()
+        SearchTerm.objects.bulk_create(
+            (SearchTerm(post_id=pk, term=term, weight=count)
+             for pk, terms in documents
+             for term, count in Counter(terms).items()),
+            batch_size=500,
+        )
+
+
+def index_post(post):
+    index_posts([post])
+
+
+@task
+def reindex_post(post_id):
+    # Текст читается при выполнении: схлопнутые правки индексируются
+    # один раз и в последней версии
+    index_posts(Post.objects.filter(pk=post_id).only('text'))
+
+
+def unindex_post(post_id):
+    # Строки SearchTerm удаляются каскадом вместе с постом
+    if backend() == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+
+
+def rebuild(batch_size=1000):
+    """Переиндексирует все посты; возвращает их число."""
+    if backend() == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    else:
+        SearchTerm.objects.all().delete()
+    indexed = 0
+    last_pk = 0
+    while True:
+        posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                     .only('text')[:batch_size])
+        if not posts:
+            return indexed
+        index_posts(posts)
+        indexed += len(posts)
+        last_pk = posts[-1].pk
+
+
+def _query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def _nothing():
+    # Аннотация нужна пагинатору, чтобы разобрать курсор по rank
+    return Post.objects.none().annotate(
+        rank=Value(0.0, output_field=FloatField()))
+
+
+def _search_fts(terms):
+    # Основы — только буквы и цифры, кавычки экранировать не нужно
+    match = ' AND '.join(f'"{term}"' for term in terms)
+    return Post.objects.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = posts_post.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+    ).annotate(
+        # rank в FTS5 — BM25 со знаком минус: чем меньше, тем лучше
+        rank=RawSQL(f'-{FTS_TABLE}.rank', (), output_field=FloatField()),
+    )
+
+
+def _search_python(terms):
+    frequencies = dict(
+        SearchTerm.objects.filter(term__in=terms).order_by().values('term')
+        .annotate(n=Count('pk')).values_list('term', 'n')
+    )
+    if len(frequencies) < len(terms):
+        return _nothing()
+    # Максимальный pk вместо COUNT(*): оценка размера корпуса за O(1)
+    total = Post.objects.aggregate(n=Max('pk'))['n'] or 1
+    weights = [
+        When(search_terms__term=term,
+             then=F('search_terms__weight') * math.log(1 + total / count))
+        for term, count in frequencies.items()
+    ]
+    return Post.objects.filter(search_terms__term__in=terms).annotate(
+        matched=Count('search_terms'),
+        rank=Sum(Case(*weights, output_field=FloatField())),
+    ).filter(matched=len(terms))
+
+
+def search(query):
+    """Посты, содержащие все слова запроса, с аннотацией ``rank``."""
+    terms = _query_terms(query)
+    if not terms:
+        return _nothing()
+    if backend() == 'fts5':
+        return _search_fts(terms)
+    return _search_python(terms)
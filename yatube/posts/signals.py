@@ -0,0 +1,97 @@
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import counters, feed_cache, page_cache, search, timeline
+from .models import Comment, Follow, Group, GroupStats, Post, User
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Группа до редактирования: её ленту тоже нужно сбросить
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_author(instance.author_id, 'posts_count', 1)
+        timeline.fan_out_post.enqueue(instance.pk)
+    # Смена группы — и при правке поста, и из list_editable в админке
+    old_group_id = None if created else instance._initial_group_id
+    if instance.group_id != old_group_id:
+        if old_group_id is not None:
+            counters.remove_group_post(old_group_id, instance.author_id)
+        if instance.group_id is not None:
+            counters.add_group_post(instance.group_id, instance.author_id,
+                                    instance.pub_date)
+    search.reindex_post.enqueue(instance.pk)
+    feed_cache.bump(*feed_cache.feed_scopes(
+        instance, [instance._initial_group_id]))
+    page_cache.purge_post(instance, [instance._initial_group_id])
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_author(instance.author_id, 'posts_count', -1)
+    if instance._initial_group_id is not None:
+        counters.remove_group_post(instance._initial_group_id,
+                                   instance.author_id)
+    search.unindex_post(instance.pk)
+    feed_cache.bump(*feed_cache.feed_scopes(
+        instance, [instance._initial_group_id]))
+    page_cache.purge_post(instance, [instance._initial_group_id])
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    # Вызывается внутри транзакции каскадного удаления
+    counters.remove_group_author(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_post_comments(instance.post_id, 1)
+    feed_cache.bump(('comments', instance.post_id))
+    page_cache.purge_comments(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post_comments(instance.post_id, -1)
+    feed_cache.bump(('comments', instance.post_id))
+    page_cache.purge_comments(instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    if kwargs.get('created'):
+        # Пустая группа тоже есть в каталоге
+        GroupStats.objects.get_or_create(group=instance)
+    feed_cache.bump(('groups',), ('group', instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_author(instance.author_id, 'followers_count', 1)
+        counters.bump_author(instance.user_id, 'following_count', 1)
+        timeline.backfill_follow.enqueue(instance.user_id,
+                                         instance.author_id)
+        # Счётчики подписок на страницах профилей обоих пользователей
+        feed_cache.bump(('follows', instance.user_id),
+                        ('author', instance.author_id),
+                        ('author', instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_author(instance.author_id, 'followers_count', -1)
+    counters.bump_author(instance.user_id, 'following_count', -1)
+    timeline.trim(instance)
+    feed_cache.bump(('follows', instance.user_id),
+                    ('author', instance.author_id),
+                    ('author', instance.user_id))
@@ -0,0 +1,55 @@
+"""Потоковый рендер длинных страниц.
+
+Для представлений из ``settings.STREAMING_VIEWS`` ответ —
+``StreamingHttpResponse``: шаблон страницы рендерится без длинного списка
+(на его месте метка ``stream_marker``), и всё до метки — ``<head>``,
+шапка, заголовок страницы — уходит клиенту сразу. Затем элементы списка
+рендерятся и отправляются по одному, последним идёт хвост страницы.
+Список может быть ``QuerySet.iterator()``: в памяти тогда одна пачка
+строк, сколько бы элементов ни было на странице.
+
+Потоковые страницы не проходят через кеш фрагментов и кеш страниц
+целиком, и у ответа нет ``response.context``.
+"""
+import uuid
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.template import RequestContext
+from django.template.loader import get_template, render_to_string
+
+
+def streaming_enabled(request):
+    match = request.resolver_match
+    return match is not None and match.view_name in settings.STREAMING_VIEWS
+
+
+def _stream(request, template_name, context, items, item_template,
+            item_name):
+    marker = uuid.uuid4().hex
+    page = render_to_string(
+        template_name, {**context, 'streamed': True, 'stream_marker': marker},
+        request,
+    )
+    head, tail = page.split(marker, 1)
+    yield head
+    template = get_template(item_template).template
+    item_context = RequestContext(request, context)
+    # Контекст-процессоры выполняются один раз, а не на каждый элемент
+    with item_context.bind_template(template):
+        for item in items:
+            with item_context.push({item_name: item}):
+                yield template.render(item_context)
+    yield tail
+
+
+def render_stream(request, template_name, context, items, item_template,
+                  item_name):
+    """Страница ``template_name``, где на месте ``{{ stream_marker }}``
+    по очереди выводится ``item_template`` для каждого из ``items``."""
+    # Шаблон рендерится уже после CsrfViewMiddleware.process_response:
+    # {% csrf_token %} там не успел бы выставить cookie csrftoken
+    get_token(request)
+    return StreamingHttpResponse(_stream(
+        request, template_name, context, items, item_template, item_name))
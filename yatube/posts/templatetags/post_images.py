@@ -0,0 +1,16 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image):
+    """Варианты картинки поста или None, пока они создаются."""
+    if not image:
+        return None
+    thumbnail = thumbnails.ready(image)
+    if thumbnail is None:
+        thumbnails.schedule(image.name)
+    return thumbnail
@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        for i in range(13):
+            Post.objects.create(author=ApiTests.author, group=cls.group,
+                                text=f'Пост {i}')
+        cls.post = Post.objects.order_by('-pk').first()
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds_return_keyset_pages(self):
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_posts', args=['group']),
+            reverse('posts:api_profile', args=['author']),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).json()
+                self.assertEqual(len(first['results']), 10)
+                self.assertEqual(first['results'][0]['text'], 'Пост 12')
+                self.assertEqual(first['results'][0]['author'], 'author')
+                self.assertEqual(first['results'][0]['group'], 'group')
+                second = self.client.get(first['next']).json()
+                self.assertEqual(len(second['results']), 3)
+                self.assertIsNone(second['next'])
+
+    def test_unchanged_feed_returns_304(self):
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Правка поста меняет ETag, хотя дата свежего поста та же
+        post = Post.objects.get(pk=ApiTests.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified(self):
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        self.assertEqual(response['Last-Modified'],
+                         http_date(ApiTests.post.pub_date.timestamp()))
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_unknown_group_and_profile(self):
+        self.assertEqual(self.client.get(
+            reverse('posts:api_group_posts', args=['none'])).status_code, 404)
+        self.assertEqual(self.client.get(
+            reverse('posts:api_profile', args=['none'])).status_code, 404)
+
+    def test_follow_feed(self):
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(ApiTests.reader)
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()['results']), 10)
+        etag = response['ETag']
+        Follow.objects.filter(user=ApiTests.reader).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_post_detail_with_comments(self):
+        url = reverse('posts:api_post_detail', args=[ApiTests.post.pk])
+        response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(data['post']['id'], ApiTests.post.pk)
+        self.assertEqual(data['post']['comments_count'], 1)
+        self.assertEqual(data['comments']['results'][0]['text'],
+                         'Комментарий')
+        etag = response['ETag']
+        Comment.objects.create(post=ApiTests.post, author=ApiTests.author,
+                               text='Ещё')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(response.json()['comments']['results']), 2)
+        self.assertEqual(self.client.get(
+            reverse('posts:api_post_detail', args=[0])).status_code, 404)
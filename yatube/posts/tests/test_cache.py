@@ -1,8 +1,7 @@
 from django.test import TestCase, Client
-from ..models import Post, Group
+from ..models import Post, Group, Comment
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.core.cache import cache
 
 User = get_user_model()
 
@@ -26,12 +25,46 @@ class ChacheTests(TestCase):
     def test_cache_index_page(self):
         response1 = self.authorized_client.get(reverse('posts:index'))
         content1 = response1.content
-        post = ChacheTests.post
-        post.delete()
+        # Изменение в обход сигналов не сбрасывает кеш
+        Post.objects.filter(pk=ChacheTests.post.pk).update(text='hidden')
         response2 = self.authorized_client.get(reverse('posts:index'))
         content2 = response2.content
         self.assertEqual(content1, content2)
-        cache.clear()
+        post = Post.objects.get(pk=ChacheTests.post.pk)
+        post.delete()
         response3 = self.authorized_client.get(reverse('posts:index'))
         content3 = response3.content
         self.assertNotEqual(content3, content2)
+
+    def test_cache_key_depends_on_page(self):
+        for i in range(10):
+            Post.objects.create(author=ChacheTests.user, text=f'page{i}')
+        first = self.authorized_client.get(reverse('posts:index')).content
+        second = self.authorized_client.get(
+            reverse('posts:index') + '?page=2').content
+        self.assertNotEqual(first, second)
+
+    def test_writes_invalidate_feeds(self):
+        urls = (
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail',
+                    kwargs={'post_id': ChacheTests.post.pk}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        post = Post.objects.get(pk=ChacheTests.post.pk)
+        post.text = 'edited text'
+        post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.authorized_client.get(url),
+                                    'edited text')
+
+    def test_comment_invalidates_post_detail(self):
+        url = reverse('posts:post_detail',
+                      kwargs={'post_id': ChacheTests.post.pk})
+        self.authorized_client.get(url)
+        Comment.objects.create(post=ChacheTests.post,
+                               author=ChacheTests.user, text='new comment')
+        self.assertContains(self.authorized_client.get(url), 'new comment')
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+from ..search import search
+
+
+class GenerateDataTests(TestCase):
+    def test_generates_consistent_data(self):
+        call_command('generate_data', users=30, posts=200, comments=50,
+                     follows=5, groups=3, batch_size=40, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertTrue(Follow.objects.exists())
+        # Счётчики, лента подписок и поиск готовы без сигналов
+        self.assertEqual(counters.reconcile_authors(), 0)
+        self.assertEqual(counters.reconcile_posts(), 0)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user_id).count(),
+            Post.objects.filter(author__following__user=follow.user_id)
+            .count(),
+        )
+        self.assertTrue(search('котик').exists())
+
+    def test_bulk_load_refreshes_feeds_only(self):
+        cache.clear()
+        cache.set('unrelated', 'kept')
+        self.client.get(reverse('posts:index'))
+        call_command('generate_data', users=5, posts=10, comments=0,
+                     follows=1, groups=1, stdout=StringIO())
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertContains(response, Post.objects.latest('pub_date').text)
+        self.assertEqual(cache.get('unrelated'), 'kept')
+
+    def test_bulk_load_fills_group_directory(self):
+        call_command('generate_data', users=10, posts=40, comments=0,
+                     follows=2, groups=3, stdout=StringIO())
+        response = self.client.get(reverse('posts:groups'))
+        self.assertEqual(
+            {group.pk: group.stats.posts_count
+             for group in response.context['groups']},
+            {group.pk: group.posts.count()
+             for group in Group.objects.all()},
+        )
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('generate_data', users=10, posts=30, comments=10,
+                     follows=3, groups=2, stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+
+    def benchmark(self, **options):
+        call_command('benchmark', requests=2, warmup=0,
+                     only=['index', 'profile'], stdout=StringIO(),
+                     **options)
+
+    def test_every_sample_url_responds(self):
+        out = StringIO()
+        call_command('benchmark', requests=1, warmup=0, stdout=out)
+        for name in ('trending', 'groups', 'post_comments', 'api_index',
+                     'api_profile', 'api_post_detail', 'api_group_posts',
+                     'api_follow_index'):
+            self.assertIn(name + ' ', out.getvalue())
+
+    def test_saves_and_compares_baseline(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'baseline.json')
+        self.benchmark(save_baseline=path)
+        with open(path) as file:
+            baseline = json.load(file)
+        self.assertEqual(set(baseline), {'index', 'profile'})
+        self.assertGreater(baseline['index']['rps'], 0)
+        # Заведомо недостижимый базовый прогон — это замедление
+        for result in baseline.values():
+            result.update(rps=10 ** 9, p50=0.0)
+        with open(path, 'w') as file:
+            json.dump(baseline, file)
+        with self.assertRaises(CommandError):
+            self.benchmark(baseline=path)
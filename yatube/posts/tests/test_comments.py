@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..paginator import COMMENTS_PER_PAGE
+
+User = get_user_model()
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='text')
+        for i in range(COMMENTS_PER_PAGE * 2 + 5):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'comment{i:03}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_post_detail_shows_first_page(self):
+        response = self.client.get(reverse(
+            'posts:post_detail', args=[CommentPaginationTests.post.pk]))
+        self.assertEqual(len(response.context['comments']),
+                         COMMENTS_PER_PAGE)
+        self.assertContains(response, 'comment000')
+        self.assertNotContains(response, f'comment{COMMENTS_PER_PAGE:03}')
+        self.assertContains(response, 'Комментариев: 105')
+        self.assertContains(response, reverse(
+            'posts:post_comments', args=[CommentPaginationTests.post.pk]
+        ) + '?page=2')
+
+    def test_partial_pages_follow_cursor(self):
+        url = reverse('posts:post_comments',
+                      args=[CommentPaginationTests.post.pk])
+        with self.assertNumQueries(1):
+            response = self.client.get(url + '?page=2')
+        page = response.context['comments']
+        self.assertEqual(page[0].text, f'comment{COMMENTS_PER_PAGE:03}')
+        self.assertIn('after=', response.context['more_query'])
+        response = self.client.get(
+            url + '?' + response.context['more_query'])
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertIsNone(response.context['more_query'])
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_new_comment_invalidates_comment_pages(self):
+        url = reverse('posts:post_comments',
+                      args=[CommentPaginationTests.post.pk])
+        self.client.get(url + '?page=3')
+        client = Client()
+        client.force_login(CommentPaginationTests.user)
+        client.post(reverse('posts:add_comment',
+                            args=[CommentPaginationTests.post.pk]),
+                    {'text': 'fresh comment'})
+        self.assertContains(self.client.get(url + '?page=3'),
+                            'fresh comment')
@@ -0,0 +1,161 @@
+from io import StringIO
+
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from ..models import (Post, Comment, Follow, AuthorStats, Group,
+                      GroupAuthor, GroupStats)
+
+User = get_user_model()
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='text')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CounterTests.reader)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_writes_update_counters(self):
+        post = Post.objects.create(author=CounterTests.user, text='text2')
+        self.assertEqual(self.stats(CounterTests.user).posts_count, 2)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'com'})
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.authorized_client.get(reverse('posts:profile_follow',
+                                           kwargs={'username': 'auth'}))
+        self.assertEqual(self.stats(CounterTests.user).followers_count, 1)
+        self.assertEqual(self.stats(CounterTests.reader).following_count, 1)
+        self.authorized_client.get(reverse('posts:profile_unfollow',
+                                           kwargs={'username': 'auth'}))
+        self.assertEqual(self.stats(CounterTests.user).followers_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(CounterTests.user).posts_count, 1)
+
+    def test_reconcile_fixes_drift(self):
+        Post.objects.create(author=CounterTests.user, text='text2')
+        Comment.objects.create(post=CounterTests.post,
+                               author=CounterTests.reader, text='com')
+        Follow.objects.create(user=CounterTests.reader,
+                              author=CounterTests.user)
+        AuthorStats.objects.filter(user=CounterTests.user).update(
+            posts_count=7, followers_count=0)
+        Post.objects.update(comments_count=5)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        stats = self.stats(CounterTests.user)
+        self.assertEqual((stats.posts_count, stats.followers_count), (2, 1))
+        CounterTests.post.refresh_from_db()
+        self.assertEqual(CounterTests.post.comments_count, 1)
+
+    def test_pages_make_no_aggregate_queries(self):
+        urls = (
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail',
+                    kwargs={'post_id': CounterTests.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(url)
+                self.assertEqual(response.context['num'], 1)
+                self.assertFalse(
+                    any('COUNT(' in q['sql'] for q in queries))
+
+
+class GroupStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.group = Group.objects.create(title='Первая', slug='first',
+                                         description='Описание')
+        cls.second = Group.objects.create(title='Вторая', slug='second',
+                                          description='Описание')
+
+    def stats(self, group):
+        stats = GroupStats.objects.get(group=group)
+        return stats.posts_count, stats.authors_count, stats.last_post_at
+
+    def test_post_writes_update_group_stats(self):
+        group = GroupStatsTests.group
+        first = Post.objects.create(author=GroupStatsTests.user,
+                                    group=group, text='1')
+        second = Post.objects.create(author=GroupStatsTests.user,
+                                     group=group, text='2')
+        third = Post.objects.create(author=GroupStatsTests.other,
+                                    group=group, text='3')
+        self.assertEqual(self.stats(group), (3, 2, third.pub_date))
+        third.group = GroupStatsTests.second
+        third.save()
+        self.assertEqual(self.stats(group), (2, 1, second.pub_date))
+        self.assertEqual(self.stats(GroupStatsTests.second),
+                         (1, 1, third.pub_date))
+        second.delete()
+        self.assertEqual(self.stats(group), (1, 1, first.pub_date))
+        first.group = None
+        first.save()
+        self.assertEqual(self.stats(group), (0, 0, None))
+        self.assertFalse(GroupAuthor.objects.filter(group=group).exists())
+
+    def test_user_delete_updates_group_stats(self):
+        group = GroupStatsTests.group
+        author = User.objects.create_user(username='gone')
+        Post.objects.create(author=author, group=group, text='1')
+        Post.objects.create(author=author, group=group, text='2')
+        post = Post.objects.create(author=GroupStatsTests.user,
+                                   group=group, text='3')
+        author.delete()
+        self.assertEqual(self.stats(group), (1, 1, post.pub_date))
+        post.delete()
+        self.assertEqual(self.stats(group), (0, 0, None))
+
+    def test_admin_list_editable_moves_counts(self):
+        post = Post.objects.create(author=GroupStatsTests.user,
+                                   group=GroupStatsTests.group, text='1')
+        client = Client()
+        client.force_login(GroupStatsTests.admin)
+        response = client.post(reverse('admin:posts_post_changelist'), {
+            'form-TOTAL_FORMS': 1,
+            'form-INITIAL_FORMS': 1,
+            'form-0-id': post.pk,
+            'form-0-group': GroupStatsTests.second.pk,
+            '_save': 'Сохранить',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.stats(GroupStatsTests.group)[:2], (0, 0))
+        self.assertEqual(self.stats(GroupStatsTests.second)[:2], (1, 1))
+
+    def test_directory_renders_from_one_query(self):
+        Post.objects.create(author=GroupStatsTests.user,
+                            group=GroupStatsTests.group, text='1')
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:groups'))
+            self.assertContains(response, 'Постов: 1')
+        self.assertEqual([group.slug for group in response.context['groups']],
+                         ['second', 'first'])
+
+    def test_reconcile_fixes_group_drift(self):
+        Post.objects.create(author=GroupStatsTests.user,
+                            group=GroupStatsTests.group, text='1')
+        GroupStats.objects.update(posts_count=9, authors_count=3)
+        GroupAuthor.objects.all().delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.stats(GroupStatsTests.group)[:2], (1, 1))
+        self.assertEqual(self.stats(GroupStatsTests.second), (0, 0, None))
+        self.assertEqual(GroupAuthor.objects.get().posts_count, 1)
@@ -0,0 +1,62 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection, IntegrityError
+from django.test import TestCase
+from ..models import Post, Group, Comment, Follow
+from ..paginator import KeysetPaginator
+from ..timeline import FEED_ORDERING, feed_for
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'План запроса в формате SQLite')
+class FeedIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(title='test title',
+                                         description='test desctiption',
+                                         slug='test-slug')
+        cls.post = Post.objects.create(author=cls.user, text='text',
+                                       group=cls.group)
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f'INDEX {index}', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def feed_page(self, queryset, ordering=('-pub_date', '-pk')):
+        return KeysetPaginator(queryset, 10, ordering).object_list[:11]
+
+    def test_index_feed_uses_index(self):
+        self.assertUsesIndex(self.feed_page(Post.objects.all()),
+                             'post_pub_date_idx')
+
+    def test_group_feed_uses_index(self):
+        self.assertUsesIndex(self.feed_page(FeedIndexTests.group.posts.all()),
+                             'post_group_pub_date_idx')
+
+    def test_profile_feed_uses_index(self):
+        self.assertUsesIndex(self.feed_page(FeedIndexTests.user.posts.all()),
+                             'post_author_pub_date_idx')
+
+    def test_follow_feed_uses_index(self):
+        self.assertUsesIndex(
+            self.feed_page(feed_for(FeedIndexTests.user), FEED_ORDERING),
+            'timeline_user_feed_idx')
+
+    def test_post_comments_use_index(self):
+        comments = Comment.objects.filter(post=FeedIndexTests.post)
+        self.assertUsesIndex(comments.order_by('created', 'pk'),
+                             'comment_post_created_idx')
+
+
+class FollowConstraintTests(TestCase):
+    def test_follow_is_unique(self):
+        user = User.objects.create_user(username='auth')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=user, author=author)
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import AuthorStats, Comment, Follow, Group, Post, User
+from ..search import search
+
+
+class ExportImportTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'dump.ndjson.gz')
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Коты', slug='cats',
+                                     description='Про котов')
+        for i in range(5):
+            post = Post.objects.create(author=author, group=group,
+                                       text=f'Котики {i}')
+            Comment.objects.create(post=post, author=reader,
+                                   text=f'Комментарий {i}')
+        Follow.objects.create(user=reader, author=author)
+        self.expected = self.snapshot()
+        call_command('export_posts', self.path, stderr=StringIO())
+        for model in (Post, Group, User):
+            model.objects.all().delete()
+
+    def snapshot(self):
+        return {
+            'posts': list(Post.objects.order_by('pub_date').values_list(
+                'author__username', 'group__slug', 'text', 'pub_date')),
+            'comments': list(Comment.objects.order_by('created').values_list(
+                'post__text', 'author__username', 'text', 'created')),
+            'follows': list(Follow.objects.values_list(
+                'user__username', 'author__username')),
+        }
+
+    def test_round_trip(self):
+        call_command('import_posts', self.path, batch_size=3,
+                     stdout=StringIO())
+        self.assertEqual(self.snapshot(), self.expected)
+        author = User.objects.get(username='author')
+        reader = User.objects.get(username='reader')
+        # Счётчики, лента подписок и индекс поиска обновлены без сигналов
+        self.assertEqual(AuthorStats.objects.get(user=author).posts_count, 5)
+        self.assertEqual(Post.objects.get(text='Котики 0').comments_count, 1)
+        self.assertEqual(reader.timeline.count(), 5)
+        self.assertEqual(search('котик').count(), 5)
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+    def test_resumes_from_checkpoint(self):
+        # Группа и посты (строки 1–6) уже загружены, дальше сбой
+        call_command('import_posts', self.path, batch_size=3,
+                     stdout=StringIO())
+        Comment.objects.all().delete()
+        Follow.objects.all().delete()
+        with open(self.path + '.checkpoint', 'w') as file:
+            json.dump({'line': 6, 'post_offset': 0, 'comment_offset': 0},
+                      file)
+        out = StringIO()
+        call_command('import_posts', self.path, batch_size=3, stdout=out)
+        self.assertIn('Продолжаем со строки 7', out.getvalue())
+        self.assertEqual(self.snapshot(), self.expected)
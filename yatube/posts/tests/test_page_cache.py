@@ -0,0 +1,132 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import page_cache
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE=True)
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PageCacheTests.author)
+
+    def test_anonymous_pages_served_from_cache(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=['group']),
+            reverse('posts:profile', args=['author']),
+            reverse('posts:post_detail', args=[PageCacheTests.post.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(second.status_code, 200)
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_anonymous_headers(self):
+        response = self.guest_client.get(reverse('posts:index'))
+        cache_control = response['Cache-Control']
+        self.assertIn('public', cache_control)
+        self.assertIn('max-age=0', cache_control)
+        self.assertIn('s-maxage=60', cache_control)
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_cached_page_keeps_security_headers(self):
+        url = reverse('posts:index')
+        first = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(url)
+        self.assertEqual(second['X-Frame-Options'], 'SAMEORIGIN')
+        self.assertEqual(second['X-Frame-Options'], first['X-Frame-Options'])
+
+    def test_unchanged_page_returns_304(self):
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_write_invalidates_page(self):
+        url = reverse('posts:post_detail', args=[PageCacheTests.post.pk])
+        self.guest_client.get(url)
+        Comment.objects.create(post=PageCacheTests.post,
+                               author=PageCacheTests.author,
+                               text='Новый комментарий')
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Новый комментарий')
+        post = Post.objects.get(pk=PageCacheTests.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_follow_invalidates_profiles(self):
+        reader = User.objects.create_user(username='reader')
+        Post.objects.create(author=reader, text='Пост читателя')
+        author_url = reverse('posts:profile', args=['author'])
+        reader_url = reverse('posts:profile', args=['reader'])
+        self.assertContains(self.guest_client.get(author_url),
+                            'Подписчиков: 0,')
+        self.assertContains(self.guest_client.get(reader_url),
+                            'подписок: 0<')
+        with self.assertNumQueries(0):
+            self.guest_client.get(author_url)
+        follow = Follow.objects.create(user=reader,
+                                       author=PageCacheTests.author)
+        self.assertContains(self.guest_client.get(author_url),
+                            'Подписчиков: 1,')
+        self.assertContains(self.guest_client.get(reader_url),
+                            'подписок: 1<')
+        follow.delete()
+        self.assertContains(self.guest_client.get(author_url),
+                            'Подписчиков: 0,')
+
+    def test_authorized_pages_not_cached(self):
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+        self.assertContains(response, 'Новая запись')
+
+    @override_settings(PAGE_CACHE_PURGE_URLS=['http://proxy'])
+    def test_post_save_purges_pages(self):
+        other = Group.objects.create(title='Другая', slug='other',
+                                     description='Описание')
+        post = Post.objects.get(pk=PageCacheTests.post.pk)
+        post.group = other
+        with mock.patch.object(page_cache, 'urlopen') as urlopen:
+            post.save()
+        purged = {call.args[0].full_url for call in urlopen.call_args_list}
+        self.assertEqual(purged, {
+            'http://proxy/',
+            'http://proxy/profile/author/',
+            f'http://proxy/posts/{post.pk}/',
+            'http://proxy/group/group/',
+            'http://proxy/group/other/',
+        })
+        self.assertEqual(
+            {call.args[0].get_method() for call in urlopen.call_args_list},
+            {'PURGE'})
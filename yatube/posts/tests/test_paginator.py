@@ -0,0 +1,88 @@
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.core.cache import cache
+from ..models import Post
+from ..paginator import KeysetPaginator, OFFSET_PAGES_LIMIT
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        # 25 постов: страницы по 10, 10 и 5
+        for i in range(25):
+            Post.objects.create(author=cls.user, text=f'text{i}')
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def get_page(self, query=''):
+        response = self.guest_client.get(reverse('posts:profile',
+                                                 kwargs={'username': 'auth'})
+                                         + query)
+        return response.context['page_obj']
+
+    def test_feed_does_not_count_posts(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(reverse('posts:index'))
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries))
+
+    def test_cursor_pages_follow_each_other(self):
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        first = self.get_page()
+        second = self.get_page('?' + first.next_query)
+        third = self.get_page('?' + second.next_query)
+        self.assertEqual(list(first) + list(second) + list(third), expected)
+        self.assertEqual(third.number, 3)
+        self.assertFalse(third.has_next())
+        back = self.get_page('?' + third.previous_query)
+        self.assertEqual(list(back), list(second))
+
+    def test_page_number_links_keep_working(self):
+        self.assertEqual(len(self.get_page('?page=3')), 5)
+        self.assertEqual(self.get_page('?page=3').number, 3)
+        # Номер за концом ленты отдаёт последнюю страницу
+        self.assertEqual(self.get_page('?page=9').number, 3)
+        self.assertEqual(self.get_page('?page=abc').number, 1)
+
+    def test_deep_page_number_is_clamped(self):
+        paginator = KeysetPaginator(Post.objects.all(), 1)
+        page = paginator.get_page(OFFSET_PAGES_LIMIT + 5)
+        self.assertEqual(page.number, OFFSET_PAGES_LIMIT)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        page = self.get_page('?page=2&after=bad_cursor')
+        self.assertEqual(page.number, 2)
+        self.assertEqual(len(self.get_page('?after=1_2_3')), 10)
+
+    def test_page_links_are_windowed(self):
+        paginator = KeysetPaginator(Post.objects.all(), 1, count=25)
+        numbers = [i for i, _ in paginator.get_page(1).page_links]
+        self.assertEqual(numbers, [1, 2, 3, None, 25])
+        page = paginator.get_page(OFFSET_PAGES_LIMIT)
+        page = paginator.get_page(OFFSET_PAGES_LIMIT + 1,
+                                  after=paginator.encode_cursor(page[0]))
+        numbers = [i for i, _ in page.page_links]
+        self.assertEqual(numbers, [1, None, 9, 10, 11, 12, None, 25])
+        # Без счётчика последняя страница неизвестна
+        paginator = KeysetPaginator(Post.objects.all(), 1)
+        numbers = [i for i, _ in paginator.get_page(5).page_links]
+        self.assertEqual(numbers, [1, None, 3, 4, 5, 6])
+
+    def test_last_page_is_selected_from_the_end(self):
+        first = self.get_page()
+        self.assertIn('last=1', first.last_query)
+        last = self.get_page('?' + first.last_query)
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        self.assertEqual(last.number, 3)
+        self.assertEqual(list(last), expected[20:])
+        self.assertIsNone(last.last_query)
+        self.assertEqual(list(self.get_page('?' + last.previous_query)),
+                         expected[10:20])
@@ -0,0 +1,60 @@
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from ..models import Post, Group, Comment, Follow
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='test title',
+                                         description='test desctiption',
+                                         slug='test-slug')
+        # У каждого поста свой автор и своя группа, у каждого
+        # комментария свой автор: N+1 в шаблоне сразу станет заметен
+        for i in range(15):
+            author = User.objects.create_user(username=f'author{i}',
+                                              first_name=f'Имя{i}')
+            Post.objects.create(author=author, text='text',
+                                group=Group.objects.create(
+                                    title=f'title{i}',
+                                    description='description',
+                                    slug=f'slug-{i}'))
+            Post.objects.create(author=author, text='text',
+                                group=cls.group)
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.post = Post.objects.first()
+        for author in User.objects.exclude(pk=cls.reader.pk):
+            Comment.objects.create(post=cls.post, author=author, text='com')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryBudgetTests.reader)
+
+    def test_feeds_fit_query_budget(self):
+        budgets = {
+            reverse('posts:index'): 3,
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'}): 4,
+            reverse('posts:profile', kwargs={'username': 'author0'}): 5,
+            reverse('posts:follow_index'): 5,
+            reverse('posts:post_detail',
+                    kwargs={'post_id': QueryBudgetTests.post.pk}): 4,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                self.assertQueryBudget(self.authorized_client, url, budget)
+
+    def test_post_detail_renders_comment_authors(self):
+        response = self.assertQueryBudget(
+            self.authorized_client,
+            reverse('posts:post_detail',
+                    kwargs={'post_id': QueryBudgetTests.post.pk}),
+            4,
+        )
+        self.assertContains(response, 'author14')
+        self.assertEqual(len(response.context['comments']), 15)
@@ -0,0 +1,80 @@
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..search import backend, search, stem, tokenize
+
+User = get_user_model()
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        self.assertEqual(stem('котики'), stem('котиков'))
+        self.assertEqual(stem('красивая'), stem('красивые'))
+        self.assertEqual(stem('гуляли'), stem('гулять'))
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('Ёжик, ЁЖИКИ!'), ['ежик', 'ежик'])
+
+
+class SearchTests(TestCase):
+    """Поиск через бэкенд по умолчанию (FTS5 на SQLite)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.cats = Post.objects.create(
+            author=self.user, text='Котики гуляли по крыше')
+        self.many_cats = Post.objects.create(
+            author=self.user, text='Котик, ещё котик и много котиков')
+        self.dogs = Post.objects.create(
+            author=self.user, text='Собаки спят')
+
+    def test_finds_other_word_forms(self):
+        self.assertEqual(list(search('собака')), [self.dogs])
+        self.assertEqual(set(search('котик')), {self.cats, self.many_cats})
+        self.assertEqual(list(search('гулять крыши')), [self.cats])
+
+    def test_ranks_by_relevance(self):
+        ranked = list(search('котик').order_by('-rank', '-pk'))
+        self.assertEqual(ranked, [self.many_cats, self.cats])
+
+    def test_index_follows_edit_and_delete(self):
+        self.dogs.text = 'Котики спят'
+        self.dogs.save()
+        self.assertIn(self.dogs, search('котик'))
+        self.assertNotIn(self.dogs, search('собака'))
+        self.cats.delete()
+        self.assertEqual(list(search('крыша')), [])
+
+    def test_view_paginates_and_keeps_query(self):
+        for i in range(12):
+            Post.objects.create(author=self.user, text=f'Котик номер {i}')
+        response = Client().get(reverse('posts:search'), {'q': 'котики'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertIn('q=', page_obj.next_query)
+        second = Client().get(reverse('posts:search') + '?'
+                              + page_obj.next_query).context['page_obj']
+        self.assertEqual(len(second), 4)
+        self.assertFalse(set(page_obj) & set(second))
+
+    def test_empty_query(self):
+        response = Client().get(reverse('posts:search'), {'q': ' , '})
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_admin_search_uses_index(self):
+        admin = site._registry[Post]
+        request = RequestFactory().get('/')
+        found, _ = admin.get_search_results(
+            request, Post.objects.all(), 'котиков')
+        self.assertEqual(set(found), {self.cats, self.many_cats})
+
+
+@override_settings(SEARCH_BACKEND='python')
+class PythonSearchTests(SearchTests):
+    """Тот же поиск через модель SearchTerm."""
+
+    def test_backend(self):
+        self.assertEqual(backend(), 'python')
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..paginator import COMMENTS_PER_PAGE
+
+User = get_user_model()
+
+
+@override_settings(STREAMING_VIEWS=('posts:profile', 'posts:post_detail'))
+class StreamingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        for i in range(12):
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+        cls.post = Post.objects.order_by('-pk').first()
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author,
+                    text=f'Комментарий {i}')
+            for i in range(COMMENTS_PER_PAGE + 10)
+        )
+        Post.objects.filter(pk=cls.post.pk).update(
+            comments_count=COMMENTS_PER_PAGE + 10)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_head_sent_before_comments_are_queried(self):
+        response = self.guest_client.get(
+            reverse('posts:post_detail', args=[StreamingTests.post.pk]))
+        self.assertTrue(response.streaming)
+        chunks = iter(response.streaming_content)
+        with self.assertNumQueries(0):
+            head = next(chunks).decode()
+        self.assertIn('<head>', head)
+        self.assertIn('<header>', head)
+        self.assertNotIn('Комментарий 0', head)
+        with self.assertNumQueries(1):
+            rest = b''.join(chunks).decode()
+        # Все комментарии одним потоком, без подгрузки
+        for i in range(COMMENTS_PER_PAGE + 10):
+            self.assertIn(f'Комментарий {i}\n', rest)
+        self.assertNotIn('js-more-comments"', rest)
+        self.assertTrue(rest.rstrip().endswith('</html>'))
+
+    def test_profile_streams_page_posts_in_order(self):
+        response = self.guest_client.get(
+            reverse('posts:profile', args=['author']))
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        positions = [content.index(f'Пост {i}\n') for i in range(11, 1, -1)]
+        self.assertEqual(positions, sorted(positions))
+        self.assertNotIn('Пост 1\n', content)
+        self.assertIn('?page=2', content)
+
+    def test_streamed_comment_form_posts(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(StreamingTests.author)
+        response = client.get(
+            reverse('posts:post_detail', args=[StreamingTests.post.pk]))
+        b''.join(response.streaming_content)
+        token = client.cookies['csrftoken'].value
+        response = client.post(
+            reverse('posts:add_comment', args=[StreamingTests.post.pk]),
+            {'text': 'Из потоковой страницы',
+             'csrfmiddlewaretoken': token},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Comment.objects.filter(
+            text='Из потоковой страницы').exists())
+
+    @override_settings(STREAMING_VIEWS=())
+    def test_streaming_is_opt_in(self):
+        response = self.guest_client.get(
+            reverse('posts:profile', args=['author']))
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.context['page_obj']), 10)
@@ -0,0 +1,183 @@
+import shutil
+import struct
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..images import normalize_upload
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='text',
+            image=SimpleUploadedFile('thumb.gif', SMALL_GIF,
+                                     content_type='image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    # Пул потоков получает задачу после фиксации, которой в TestCase нет:
+    # страница рендерится, пока миниатюр ещё не существует
+    @override_settings(TASKS_BACKEND='core.tasks.ThreadBackend')
+    def test_page_falls_back_to_original_image(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, ThumbnailTests.post.image.url)
+        self.assertIsNone(thumbnails.ready(ThumbnailTests.post.image))
+
+    def test_generated_thumbnail_is_ready(self):
+        image = ThumbnailTests.post.image
+        thumbnails.generate(image.name)
+        thumbnail = thumbnails.ready(image)
+        self.assertIsNotNone(thumbnail)
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, thumbnail.src)
+        self.assertContains(response, thumbnail.srcset)
+        self.assertNotContains(response, image.url)
+
+    @override_settings(TASKS_BACKEND='core.tasks.ThreadBackend')
+    def test_generate_refreshes_cached_feeds(self):
+        image = ThumbnailTests.post.image
+        urls = [reverse('posts:index'),
+                reverse('posts:profile', args=['auth']),
+                reverse('posts:post_detail', args=[ThumbnailTests.post.pk])]
+        for url in urls:
+            self.assertNotContains(Client().get(url), 'srcset')
+        thumbnails.generate(image.name)
+        srcset = thumbnails.ready(image).srcset
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(Client().get(url), srcset)
+
+    @override_settings(POST_IMAGE_WIDTHS=(100, 200))
+    def test_srcset_lists_every_width(self):
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200)).save(buffer, format='JPEG')
+        post = Post.objects.create(
+            author=ThumbnailTests.user,
+            text='wide',
+            image=SimpleUploadedFile('wide.jpg', buffer.getvalue(),
+                                     content_type='image/jpeg'),
+        )
+        thumbnails.generate(post.image.name)
+        srcset = thumbnails.ready(post.image).srcset
+        self.assertRegex(srcset, r' 100w, .* 200w$')
+
+
+def camera_exif():
+    exif = Image.Exif()
+    exif[0x010f] = 'Camera'
+    exif[0x0112] = 1
+    return exif.tobytes()
+
+
+def jpeg_bytes(size, color='black', **save_options):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='JPEG', **save_options)
+    return buffer.getvalue()
+
+
+def mpo_bytes(first, second):
+    """Два JPEG в одном файле с сегментом APP2 «MPF», как у камер
+    телефонов; Pillow 8 сам MPO не сохраняет."""
+    tiff_size = 8 + 2 + 3 * 12 + 4 + 2 * 16
+    app2_size = 2 + 4 + tiff_size
+    # SOI, маркер и длина APP2, «MPF\0»: смещения считаются от TIFF
+    tiff_offset = 2 + 2 + 2 + 4
+    first_size = len(first) + 2 + app2_size
+    tiff = (
+        b'MM\x00\x2a' + struct.pack('>IH', 8, 3)
+        + struct.pack('>HHI4s', 0xB000, 7, 4, b'0100')
+        + struct.pack('>HHII', 0xB001, 4, 1, 2)
+        + struct.pack('>HHII', 0xB002, 7, 32, 50) + struct.pack('>I', 0)
+        + struct.pack('>IIIHH', 0x20030000, first_size, 0, 0, 0)
+        + struct.pack('>IIIHH', 0, len(second), first_size - tiff_offset,
+                      0, 0)
+    )
+    return (first[:2] + b'\xff\xe2' + struct.pack('>H', app2_size)
+            + b'MPF\x00' + tiff + first[2:] + second)
+
+
+class NormalizeUploadTests(TestCase):
+    def upload(self, size, **save_options):
+        return SimpleUploadedFile('photo.jpg',
+                                  jpeg_bytes(size, **save_options),
+                                  content_type='image/jpeg')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_downscales_and_strips_exif(self):
+        exif = Image.Exif()
+        exif[0x010f] = 'Camera'
+        result = normalize_upload(self.upload((300, 150),
+                                              exif=exif.tobytes()))
+        with Image.open(result) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertFalse(image.getexif())
+        self.assertEqual(result.name, 'photo.jpg')
+
+    def test_strips_png_exif(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (50, 50)).save(buffer, format='PNG',
+                                         exif=camera_exif())
+        upload = SimpleUploadedFile('image.png', buffer.getvalue(),
+                                    content_type='image/png')
+        result = normalize_upload(upload)
+        with Image.open(result) as image:
+            self.assertEqual(image.format, 'PNG')
+            self.assertEqual(image.mode, 'RGBA')
+            self.assertFalse(image.getexif())
+            self.assertNotIn('exif', image.info)
+
+    def test_mpo_saved_as_first_frame_jpeg(self):
+        upload = SimpleUploadedFile(
+            'phone.jpg',
+            mpo_bytes(jpeg_bytes((60, 30), 'red', exif=camera_exif()),
+                      jpeg_bytes((60, 30), 'blue')),
+            content_type='image/jpeg',
+        )
+        with Image.open(upload) as image:
+            self.assertEqual(image.format, 'MPO')
+        result = normalize_upload(upload)
+        with Image.open(result) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertFalse(getattr(image, 'is_animated', False))
+            self.assertFalse(image.getexif())
+            red, green, blue = image.getpixel((30, 15))
+            self.assertGreater(red, blue)
+
+    def test_keeps_small_clean_upload(self):
+        upload = self.upload((50, 50))
+        self.assertIs(normalize_upload(upload), upload)
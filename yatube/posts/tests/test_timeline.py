@@ -0,0 +1,50 @@
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from ..models import Post, Follow, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(author=cls.author, text='old')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(TimelineTests.reader)
+
+    def follow_page(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': 'author'}))
+        self.assertEqual(self.follow_page(), [TimelineTests.old_post])
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': 'author'}))
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.follow_page(), [])
+
+    def test_new_post_is_fanned_out(self):
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        post = Post.objects.create(author=TimelineTests.author, text='new')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineTests.reader, post=post).exists())
+        self.assertEqual(self.follow_page(), [post, TimelineTests.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_read_without_fan_out(self):
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        post = Post.objects.create(author=TimelineTests.author, text='new')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.follow_page(), [post, TimelineTests.old_post])
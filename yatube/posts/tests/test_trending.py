@@ -0,0 +1,86 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Follow, Post, TrendingPost
+
+User = get_user_model()
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.popular = User.objects.create_user(username='popular')
+        cls.reader = User.objects.create_user(username='reader')
+        for i in range(3):
+            follower = User.objects.create_user(username=f'follower{i}')
+            Follow.objects.create(user=follower, author=cls.popular)
+        cls.quiet = Post.objects.create(author=cls.author, text='Тихий')
+        cls.discussed = Post.objects.create(author=cls.author,
+                                            text='Обсуждаемый')
+        cls.followed = Post.objects.create(author=cls.popular,
+                                           text='От популярного')
+        # Все посты опубликованы одновременно: решают комментарии
+        Post.objects.update(pub_date=timezone.now() - timedelta(hours=1))
+        for i in range(2):
+            Comment.objects.create(post=cls.discussed, author=cls.reader,
+                                   text=f'Комментарий {i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def ranked(self):
+        return list(TrendingPost.objects.order_by('-score').values_list(
+            'post__text', flat=True))
+
+    def test_comments_and_followers_raise_score(self):
+        self.assertEqual(trending.update(), 3)
+        self.assertEqual(self.ranked(),
+                         ['Обсуждаемый', 'От популярного', 'Тихий'])
+
+    def test_update_reads_only_new_activity(self):
+        trending.update()
+        # Без новой активности: два курсора и два пустых диапазона pk
+        # (плюс точка сохранения транзакции)
+        with self.assertNumQueries(6):
+            self.assertEqual(trending.update(), 0)
+        for i in range(3):
+            Comment.objects.create(post=TrendingTests.quiet,
+                                   author=TrendingTests.reader,
+                                   text=f'Ответ {i}')
+        self.assertEqual(trending.update(), 1)
+        self.assertEqual(self.ranked()[0], 'Тихий')
+
+    def test_old_activity_decays(self):
+        long_ago = timezone.now() - timedelta(hours=48)
+        Post.objects.filter(pk=TrendingTests.discussed.pk).update(
+            pub_date=long_ago)
+        Comment.objects.filter(post=TrendingTests.discussed).update(
+            created=long_ago)
+        trending.update()
+        self.assertEqual(self.ranked()[-1], 'Обсуждаемый')
+
+    @override_settings(TRENDING_SIZE=2)
+    def test_list_is_trimmed(self):
+        call_command('rank_trending', stdout=StringIO())
+        self.assertEqual(self.ranked(), ['Обсуждаемый', 'От популярного'])
+
+    def test_trending_page(self):
+        trending.update()
+        client = Client()
+        response = client.get(reverse('posts:trending'))
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Обсуждаемый', 'От популярного', 'Тихий'])
+        Post.objects.filter(pk=TrendingTests.quiet.pk).delete()
+        response = client.get(reverse('posts:trending'))
+        self.assertEqual(len(response.context['page_obj']), 2)
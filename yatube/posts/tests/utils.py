@@ -0,0 +1,23 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверка, что страница укладывается в фиксированное число запросов.
+
+    Бюджет не зависит от числа постов на странице и комментариев,
+    поэтому N+1 в шаблонах сразу его превышает.
+    """
+
+    def assertQueryBudget(self, client, url, budget):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{url}: {len(queries)} запросов при бюджете {budget}\n'
+            + '\n'.join(query['sql'] for query in queries)
+        )
+        return response
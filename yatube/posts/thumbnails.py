@@ -0,0 +1,137 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Тег ``{% thumbnail %}`` создаёт миниатюру прямо в запросе, который
+первым показал картинку. Здесь миниатюры создаются фоновой задачей
+(``core/tasks.py``) сразу после сохранения поста, а шаблоны через
+``{% post_thumbnail %}`` только читают готовые миниатюры и до их
+появления показывают оригинал. Когда миниатюры готовы, задача сбрасывает
+фрагменты и страницы с постом.
+
+Для каждой картинки создаётся несколько ширин из
+``settings.POST_IMAGE_WIDTHS`` в JPEG и, если Pillow собран с libwebp,
+в WebP; браузер выбирает подходящую по ``srcset``.
+"""
+import logging
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+from core.tasks import task
+
+from . import feed_cache, page_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Ширина карточки поста в ленте и её пропорции
+CARD_WIDTH = 960
+CARD_RATIO = 339 / 960
+
+# Вариант картинки: ширина, формат и готовая миниатюра sorl
+Variant = namedtuple('Variant', 'width format thumbnail')
+PostImage = namedtuple('PostImage', 'src srcset webp_srcset')
+
+
+def formats():
+    if features.check('webp'):
+        return ('WEBP', 'JPEG')
+    return ('JPEG',)
+
+
+def specs():
+    """Пары (geometry, options) для всех вариантов картинки поста."""
+    return [
+        (f'{width}x{round(width * CARD_RATIO)}',
+         {'crop': 'center', 'upscale': False, 'format': image_format})
+        for width in settings.POST_IMAGE_WIDTHS
+        for image_format in formats()
+    ]
+
+
+def _thumbnail_options(source, options):
+    # Те же умолчания, что подставляет ThumbnailBackend.get_thumbnail:
+    # от них зависит имя файла миниатюры
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def _lookup(source, geometry, options):
+    options = _thumbnail_options(source, options)
+    name = default.backend._get_thumbnail_filename(source, geometry, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def variants(image):
+    """Готовые варианты картинки из хранилища sorl; не генерирует их."""
+    source = ImageFile(image)
+    found = []
+    for geometry, options in specs():
+        thumbnail = _lookup(source, geometry, options)
+        if thumbnail is not None:
+            found.append(Variant(thumbnail.width, options['format'],
+                                 thumbnail))
+    return found
+
+
+def _srcset(found, image_format):
+    # Маленький оригинал без увеличения даёт одинаковые ширины
+    widths = {}
+    for variant in found:
+        if variant.format == image_format:
+            widths.setdefault(variant.width, variant.thumbnail.url)
+    return ', '.join(f'{url} {width}w' for width, url in sorted(
+        widths.items()))
+
+
+def ready(image):
+    """Картинка для шаблона или None, пока варианты JPEG не созданы."""
+    found = variants(image)
+    jpegs = [variant for variant in found if variant.format == 'JPEG']
+    if len(jpegs) < len(settings.POST_IMAGE_WIDTHS):
+        return None
+    wide = [variant for variant in jpegs if variant.width >= CARD_WIDTH]
+    src = min(wide, key=lambda variant: variant.width) if wide else max(
+        jpegs, key=lambda variant: variant.width)
+    return PostImage(src.thumbnail.url, _srcset(found, 'JPEG'),
+                     _srcset(found, 'WEBP'))
+
+
+@task
+def generate(name):
+    # Битая картинка не исправится от повторов: ошибку только логируем
+    try:
+        # Пока задача ждала, пост с картинкой могли удалить
+        if not default_storage.exists(name):
+            return
+        with metrics.timer('thumbnail_ms'):
+            for geometry, options in specs():
+                get_thumbnail(name, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+        return
+    # Фрагменты и страницы, собранные до миниатюр, показывают оригинал
+    for post in Post.objects.filter(image=name).select_related('author'):
+        feed_cache.bump(*feed_cache.feed_scopes(post))
+        page_cache.purge_post(post)
+
+
+def schedule(name):
+    """Ставит создание миниатюр картинки в очередь задач."""
+    if name:
+        generate.enqueue(name)
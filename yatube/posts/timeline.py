@@ -0,0 +1,145 @@
+"""Материализованная лента подписок (fan-out-on-write).
+
+Новый пост записывается в ленты подписчиков автора фоновой задачей
+сразу после сохранения, поэтому
+страница «Избранные авторы» читается одним диапазоном по индексу
+``(user, pub_date)``. Для авторов, у которых подписчиков больше
+``TIMELINE_FANOUT_LIMIT``, рассылка не выполняется: их посты
+подмешиваются в ленту при чтении (fan-out-on-read).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Q
+
+from core.tasks import task
+
+from . import feed_cache
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+CELEBRITIES_CACHE_KEY = 'timeline:celebrities'
+CELEBRITIES_CACHE_TIMEOUT = 60 * 10
+FEED_ORDERING = ('-feed_date', '-feed_post')
+
+
+def celebrity_ids():
+    """Авторы, чьи посты читаются из ленты без рассылки."""
+    ids = cache.get(CELEBRITIES_CACHE_KEY)
+    if ids is None:
+        ids = set(AuthorStats.objects.filter(
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+        ).values_list('user_id', flat=True))
+        cache.set(CELEBRITIES_CACHE_KEY, ids, CELEBRITIES_CACHE_TIMEOUT)
+    return ids
+
+
+def is_celebrity(author_id):
+    if author_id in celebrity_ids():
+        return True
+    if AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists():
+        cache.set(CELEBRITIES_CACHE_KEY, celebrity_ids() | {author_id},
+                  CELEBRITIES_CACHE_TIMEOUT)
+        return True
+    return False
+
+
+def fan_out(post):
+    """Записывает новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+@task
+def fan_out_post(post_id):
+    """``fan_out`` из очереди задач; затем меняет поколение ``timeline``,
+    от которого зависит ETag ленты подписок."""
+    post = Post.objects.filter(pk=post_id).only(
+        'author', 'pub_date').first()
+    if post is not None:
+        fan_out(post)
+        feed_cache.bump(('timeline',))
+
+
+def backfill(follow):
+    """Добавляет в ленту подписчика последние посты нового автора."""
+    if is_celebrity(follow.author_id):
+        return
+    posts = Post.objects.filter(author_id=follow.author_id).values_list(
+        'pk', 'pub_date')[:settings.TIMELINE_BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=follow.user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+@task
+def backfill_follow(user_id, author_id):
+    # Пока задача ждала, от автора могли отписаться
+    follow = Follow.objects.filter(user_id=user_id,
+                                   author_id=author_id).first()
+    if follow is not None:
+        backfill(follow)
+        feed_cache.bump(('follows', user_id))
+
+
+def backfill_author(author_id):
+    """Как ``backfill`` для всех подписчиков автора сразу, одним
+    INSERT … SELECT; нужен для массовой загрузки подписок."""
+    if is_celebrity(author_id):
+        return
+    sql = (
+        f'INSERT INTO {TimelineEntry._meta.db_table} '
+        f'(user_id, post_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.pub_date '
+        f'FROM {Follow._meta.db_table} f CROSS JOIN ('
+        f'  SELECT id, pub_date FROM {Post._meta.db_table}'
+        f'  WHERE author_id = %s ORDER BY pub_date DESC, id DESC LIMIT %s'
+        f') p '
+        f'WHERE f.author_id = %s AND NOT EXISTS ('
+        f'  SELECT 1 FROM {TimelineEntry._meta.db_table} t'
+        f'  WHERE t.user_id = f.user_id AND t.post_id = p.id)'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql, [author_id, settings.TIMELINE_BACKFILL_SIZE, author_id])
+
+
+def trim(follow):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id,
+        post__author_id=follow.author_id,
+    ).delete()
+
+
+def feed_for(user):
+    """Посты ленты подписок пользователя.
+
+    Сортировать результат нужно по ``FEED_ORDERING``: без подмешанных
+    авторов это порядок индекса ``timeline_user_feed_idx``.
+    """
+    celebrities = Follow.objects.filter(
+        user=user, author_id__in=celebrity_ids()
+    ).values_list('author_id', flat=True)
+    if not celebrities:
+        return Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_post=F('timeline_entries__post_id'),
+        )
+    return Post.objects.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=list(celebrities))
+    ).annotate(feed_date=F('pub_date'), feed_post=F('pk'))
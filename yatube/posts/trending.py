@@ -0,0 +1,126 @@
+"""Лента «Популярное»: рейтинг постов по затухающей активности.
+
+Публикация поста и каждый комментарий к нему добавляют посту вклад,
+который затухает вдвое каждые ``TRENDING_HALF_LIFE`` часов; вклад
+публикации больше у автора с большим числом подписчиков. Затухание у
+всех постов одинаковое, поэтому рейтинг хранится как логарифм
+активности, приведённой к общей эпохе: событие в момент ``t`` с весом
+``w`` даёт ``log(w) + λ·(t − EPOCH)``. Порядок постов со временем не
+меняется, и старые рейтинги пересчитывать не нужно.
+
+``update()`` (``manage.py rank_trending``) читает только посты и
+комментарии, появившиеся после прошлого прогона (``TrendingCursor``),
+складывает их вклады с хранимыми и оставляет в ``TrendingPost``
+``TRENDING_SIZE`` лучших постов. Представление ``trending`` читает
+страницу этого списка по индексу рейтинга.
+"""
+import math
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import feed_cache
+from .models import Comment, Post, TrendingCursor, TrendingPost
+
+EPOCH = datetime(2021, 1, 1, tzinfo=timezone.utc)
+TRENDING_ORDERING = ('-score', '-pk')
+# События старше стольких периодов полураспада в рейтинг не попадают:
+# их вклад меньше тысячной доли
+HORIZON_HALF_LIVES = 10
+
+
+def _rate():
+    return math.log(2) / (settings.TRENDING_HALF_LIFE * 3600)
+
+
+def event_score(moment, weight=1.0):
+    """Вклад события в рейтинг, в логарифмической шкале."""
+    return math.log(weight) + _rate() * (moment - EPOCH).total_seconds()
+
+
+def author_weight(followers_count):
+    return 1 + settings.TRENDING_FOLLOWER_WEIGHT * math.log1p(
+        followers_count or 0)
+
+
+def _add(a, b):
+    """log(e^a + e^b) без переполнения."""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def _new_rows(name, queryset, fields, batch_size):
+    """Строки с pk после курсора ``name``, пачками; курсор сдвигается
+    после каждой пачки в той же транзакции."""
+    cursor, _ = TrendingCursor.objects.get_or_create(name=name)
+    while True:
+        rows = list(queryset.filter(pk__gt=cursor.last_pk).order_by('pk')
+                    .values_list('pk', *fields)[:batch_size])
+        if not rows:
+            break
+        yield from rows
+        cursor.last_pk = rows[-1][0]
+        cursor.save()
+
+
+def update(batch_size=1000):
+    """Добавляет в рейтинг новую активность; возвращает, скольких
+    постов она коснулась."""
+    horizon = timezone.now() - timedelta(
+        hours=settings.TRENDING_HALF_LIFE * HORIZON_HALF_LIVES)
+    scores = {}
+    with transaction.atomic():
+        posts = _new_rows('post', Post.objects, (
+            'pub_date', 'author__stats__followers_count'), batch_size)
+        for pk, pub_date, followers in posts:
+            if pub_date >= horizon:
+                scores[pk] = _add(scores.get(pk), event_score(
+                    pub_date, author_weight(followers)))
+        comments = _new_rows('comment', Comment.objects,
+                             ('post_id', 'created'), batch_size)
+        for _, post_id, created in comments:
+            if created >= horizon:
+                scores[post_id] = _add(scores.get(post_id),
+                                       event_score(created))
+        if not scores:
+            return 0
+        ids = list(scores)
+        for start in range(0, len(ids), batch_size):
+            _store({pk: scores[pk] for pk in ids[start:start + batch_size]})
+        _trim(settings.TRENDING_SIZE)
+    feed_cache.bump(('trending',))
+    return len(scores)
+
+
+def _store(scores):
+    stored = TrendingPost.objects.in_bulk(list(scores))
+    # Пост мог быть удалён после того, как попал в выборку
+    alive = set(Post.objects.filter(pk__in=list(scores)).values_list(
+        'pk', flat=True))
+    created, changed = [], []
+    for post_id, score in scores.items():
+        if post_id in stored:
+            stored[post_id].score = _add(stored[post_id].score, score)
+            changed.append(stored[post_id])
+        elif post_id in alive:
+            created.append(TrendingPost(post_id=post_id, score=score))
+    TrendingPost.objects.bulk_create(created)
+    TrendingPost.objects.bulk_update(changed, ['score'])
+
+
+def _trim(size):
+    threshold = list(TrendingPost.objects.order_by('-score').values_list(
+        'score', flat=True)[size - 1:size])
+    if threshold:
+        TrendingPost.objects.filter(score__lt=threshold[0]).delete()
+
+
+def trending_posts():
+    """Посты «Популярного» с аннотацией ``score`` для пагинатора."""
+    return Post.objects.filter(trending__isnull=False).annotate(
+        score=F('trending__score'))
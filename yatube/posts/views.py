@@ -1,43 +1,67 @@
 from django.shortcuts import redirect, render, get_object_or_404
-from .models import Post, Group, User, Follow
-from django.core.paginator import Paginator
+from django.db import transaction
+from . import thumbnails
+from .models import Post, Group, User, Follow, Comment
+from .counters import author_stats, group_stats
 from .forms import PostForm, CommentForm
+from .feed_cache import cache_context, fragment_key
+from .paginator import COMMENT_ORDERING, COMMENTS_PER_PAGE, paginate
+from .search import SEARCH_ORDERING, search
+from .streaming import render_stream, streaming_enabled
+from .timeline import FEED_ORDERING, feed_for
+from .trending import TRENDING_ORDERING, trending_posts
 from django.contrib.auth.decorators import login_required
 
 
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj = paginate(request, post_list)
     context = {
         'page_obj': page_obj,
+        **cache_context(request, ('index',)),
     }
     return render(request, 'posts/index.html', context)
 
 
+def trending(request):
+    post_list = trending_posts().for_feed()
+    page_obj = paginate(request, post_list, ordering=TRENDING_ORDERING)
+    context = {
+        'page_obj': page_obj,
+        # Правка поста сбрасывает область index, пересчёт — trending
+        **cache_context(request, ('index',), ('trending',)),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def groups(request):
+    """Каталог групп: сводки хранятся готовыми, один запрос."""
+    group_list = Group.objects.select_related('stats').order_by('title')
+    return render(request, 'posts/groups.html', {'groups': group_list})
+
+
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = get_object_or_404(Group.objects.select_related('stats'),
+                              slug=slug)
+    post_list = group.posts.for_feed()
+    page_obj = paginate(request, post_list,
+                        count=group_stats(group).posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
+        **cache_context(request, ('group', group.pk)),
     }
     template = 'posts/group_list.html'
     return render(request, template, context)
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
 
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    num = post_list.count()
+    post_list = author.posts.for_feed()
+    stats = author_stats(author)
+    page_obj = paginate(request, post_list, count=stats.posts_count)
     if request.user.is_authenticated:
         following = Follow.objects.filter(user=request.user,
                                           author=author).exists()
@@ -45,30 +69,69 @@ def profile(request, username):
         following = False
     context = {
         'page_obj': page_obj,
-        'num': num,
+        'num': stats.posts_count,
+        'stats': stats,
         'author': author,
-        'following': following
+        'following': following,
+        **cache_context(request, ('author', author.pk)),
     }
+    if streaming_enabled(request):
+        return render_stream(request, 'posts/profile.html', context,
+                             page_obj, 'posts/includes/profile_post.html',
+                             'post')
     return render(request, 'posts/profile.html', context)
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__stats'),
+        pk=post_id,
+    )
+    # Первая страница комментариев; запрос выполнится, только если
+    # фрагмент не нашёлся в кеше. Остальные страницы — post_comments
+    comments = Comment.objects.for_post_page().filter(
+        post_id=post.pk)[:COMMENTS_PER_PAGE]
+    more_query = ('page=2' if post.comments_count > COMMENTS_PER_PAGE
+                  else None)
     form = CommentForm(request.POST or None)
-    author_all_posts = post.author.posts.all()
-    num_of_posts = author_all_posts.count()
+    num_of_posts = author_stats(post.author).posts_count
     text = post.text[:30]
     context = {
         'post': post,
         'text': text,
         'num': num_of_posts,
         'comments': comments,
+        'more_query': more_query,
         'form': form,
+        'comments_cache_key': fragment_key(request, ('comments', post.pk)),
+        **cache_context(request, ('post', post.pk),
+                        ('author', post.author_id)),
     }
+    if streaming_enabled(request):
+        # Все комментарии сразу, пачками с сервера без «Показать ещё»
+        all_comments = Comment.objects.for_post_page().filter(
+            post_id=post.pk).iterator(chunk_size=COMMENTS_PER_PAGE)
+        return render_stream(request, 'posts/post_detail.html', context,
+                             all_comments, 'posts/includes/comment.html',
+                             'comment')
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующие страницы комментариев — фрагмент HTML для подгрузки."""
+    page_obj = paginate(
+        request, Comment.objects.for_post_page().filter(post_id=post_id),
+        per_page=COMMENTS_PER_PAGE, ordering=COMMENT_ORDERING,
+    )
+    context = {
+        'post_id': post_id,
+        'comments': page_obj,
+        'more_query': page_obj.next_query,
+        **cache_context(request, ('comments', post_id)),
+    }
+    return render(request, 'posts/comments.html', context)
+
+
 @login_required
 def post_create(request):
     username = request.user.username
@@ -79,7 +142,11 @@ def post_create(request):
     if form.is_valid() and request.method == 'POST':
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        # Счётчики из сигналов меняются в той же транзакции
+        with transaction.atomic():
+            post.save()
+        if post.image:
+            thumbnails.schedule(post.image.name)
         return redirect('posts:profile', username=username)
     return render(request, 'posts/post_create.html',
                            {'form': form, 'is_edit': False})
@@ -95,7 +162,11 @@ def post_edit(request, post_id):
         instance=post
     )
     if request.method == 'POST' and form.is_valid():
-        form.save()
+        # Смена группы меняет сводки двух групп: вместе или никак
+        with transaction.atomic():
+            post = form.save()
+        if post.image and 'image' in form.changed_data:
+            thumbnails.schedule(post.image.name)
         return redirect('posts:post_detail', post_id=post_id)
     return render(request, 'posts/post_create.html',
                            {'form': form, 'is_edit': True,
@@ -110,16 +181,27 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    post_list = search(query).for_feed()
+    page_obj = paginate(request, post_list, ordering=SEARCH_ORDERING,
+                        keep=('q',))
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page = request.GET.get('page')
-    page_obj = paginator.get_page(page)
+    post_list = feed_for(request.user).for_feed()
+    page_obj = paginate(request, post_list, ordering=FEED_ORDERING)
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
@@ -11,6 +11,9 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -23,7 +26,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = '!_r8vk37t-@83ol@#=l+8#_mydx)w=3*bkp8rj!l1jkhz_t&!9'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DJANGO_DEBUG', '1') != '0'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -50,6 +53,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.db_router.ReplicaMiddleware',
+    'posts.page_cache.AnonymousPageCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,12 +67,22 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+# В отладке шаблоны перечитываются с диска при каждом рендере, в
+# продакшене (DJANGO_DEBUG=0) скомпилированные шаблоны, включая
+# подключаемые через {% include %}, хранятся в памяти процесса
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -84,12 +100,61 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Режим SQLite для нескольких воркеров gunicorn (core/db_backends):
+# WAL не блокирует чтение записью, BEGIN IMMEDIATE и busy_timeout
+# заставляют писателей ждать друг друга вместо «database is locked».
+# SQLITE_TUNING=0 — стандартный бэкенд без настроек.
+SQLITE_TUNING = os.getenv('SQLITE_TUNING', '1') != '0'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    # В WAL fsync только на контрольных точках; сбой питания может
+    # потерять последние транзакции, но не повредить базу
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — в КиБ: 64 МиБ страничного кеша
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.getenv('SQLITE_PATH',
+                          os.path.join(BASE_DIR, 'db.sqlite3')),
     }
 }
+if SQLITE_TUNING:
+    DATABASES['default'].update({
+        'ENGINE': 'core.db_backends.sqlite3',
+        # Соединение живёт между запросами: PRAGMA и открытие файла
+        # не повторяются на каждом запросе
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            'immediate_transactions': True,
+        },
+    })
+
+# Реплики только для чтения (core/db_router.py), через запятую:
+#   DATABASE_REPLICAS=/var/lib/yatube/replica1.sqlite3,...
+# Читают с них GET-запросы к REPLICA_VIEWS; пользователь, который только
+# что что-то записал, REPLICA_STICKY_SECONDS секунд читает из основной
+# базы. Фрагменты лент, собранные по реплике, живут
+# REPLICA_CACHE_TIMEOUT секунд: реплика могла отставать.
+REPLICA_DATABASES = {
+    f'replica{index}': {**DATABASES['default'], 'NAME': path}
+    for index, path in enumerate(
+        filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')))
+}
+DATABASES.update(REPLICA_DATABASES)
+DATABASE_REPLICAS = list(REPLICA_DATABASES)
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+REPLICA_VIEWS = ('posts:index', 'posts:group_posts', 'posts:profile',
+                 'posts:post_detail', 'posts:follow_index',
+                 'posts:trending', 'posts:groups')
+REPLICA_STICKY_SECONDS = 10
+REPLICA_CACHE_TIMEOUT = 10
 
 
 # Password validation
@@ -142,8 +207,100 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# По умолчанию кеш живёт в памяти процесса. Нескольким воркерам gunicorn
+# нужен общий бэкенд, чтобы сброс кеша и блокировки были согласованы:
+#   CACHE_BACKEND=core.cache_backends.SQLiteCache
+#   CACHE_LOCATION=/var/tmp/yatube-cache.sqlite3
+# или memcached/redis с их LOCATION.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv('CACHE_BACKEND',
+                             'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
+
+# Лента подписок: авторам с большим числом подписчиков посты не рассылаются
+# при публикации (fan-out-on-write), а подмешиваются при чтении ленты
+TIMELINE_FANOUT_LIMIT = 1000
+# Сколько последних постов автора попадает в ленту при подписке
+TIMELINE_BACKFILL_SIZE = 1000
+
+# Фрагменты лент сбрасываются сигналами записи (posts/feed_cache.py),
+# поэтому хранить их можно долго
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# «Популярное» (posts/trending.py): вклад поста и комментария затухает
+# вдвое за TRENDING_HALF_LIFE часов, вес публикации растёт с логарифмом
+# числа подписчиков автора; manage.py rank_trending хранит
+# TRENDING_SIZE лучших постов
+TRENDING_HALF_LIFE = 12
+TRENDING_FOLLOWER_WEIGHT = 0.5
+TRENDING_SIZE = 500
+
+# Страницы лент целиком для анонимов (posts/page_cache.py): в кеше
+# процесса, пока не сменились поколения их фрагментов, и на обратном
+# прокси s-maxage секунд. Прокси не должен кешировать запросы с cookie
+# из PAGE_CACHE_BYPASS_COOKIES; PAGE_CACHE_PURGE_URLS — адреса прокси
+# через запятую, им уходит PURGE изменённых страниц.
+PAGE_CACHE = os.getenv('PAGE_CACHE') == '1'
+PAGE_CACHE_VIEWS = ('posts:index', 'posts:group_posts', 'posts:profile',
+                    'posts:post_detail', 'posts:trending')
+PAGE_CACHE_BYPASS_COOKIES = ('sessionid', 'messages', 'primary_pin')
+PAGE_CACHE_SECONDS = 60
+PAGE_CACHE_TIMEOUT = 60 * 5
+PAGE_CACHE_PURGE_URLS = list(
+    filter(None, os.getenv('PAGE_CACHE_PURGE_URLS', '').split(',')))
+
+# Представления, которые отдают страницу потоком (posts/streaming.py):
+# шапка уходит сразу, посты и комментарии — по мере рендера, например
+#   STREAMING_VIEWS=posts:profile,posts:post_detail
+STREAMING_VIEWS = tuple(
+    filter(None, os.getenv('STREAMING_VIEWS', '').split(',')))
+
+# Индекс поиска по постам: 'fts5' (SQLite) или 'python' (модель
+# SearchTerm); None — FTS5, если SQLite собран с ним
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND') or None
+
+# Хранилище сессий: cached_db читает сессию из кеша и пишет её в базу
+# (кеш сквозной записи), signed_cookies хранит сессию в самой cookie и
+# не обращается ни к базе, ни к кешу — для небольших сессий, где только
+# вход пользователя. db — без кеша. cached_db и cache — только с общим
+# CACHE_BACKEND: в LocMemCache другого воркера сессия после выхода
+# осталась бы действительной. По умолчанию cached_db, если кеш общий.
+# Истёкшие сессии в базе удаляет manage.py clearsessions пачками.
+SHARED_CACHE = not CACHES['default']['BACKEND'].endswith('.LocMemCache')
+SESSION_BACKEND = os.getenv(
+    'SESSION_BACKEND', 'cached_db' if SHARED_CACHE else 'db')
+if SESSION_BACKEND in ('cache', 'cached_db') and not SHARED_CACHE:
+    raise ImproperlyConfigured(
+        f'SESSION_BACKEND={SESSION_BACKEND} требует общего CACHE_BACKEND, '
+        'а не LocMemCache'
+    )
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + SESSION_BACKEND
+
+# Очередь побочных эффектов записи (core/tasks.py): индекс поиска,
+# рассылка в ленты, миниатюры. ThreadBackend — пул потоков процесса,
+# DatabaseBackend — таблица core_task и manage.py run_tasks,
+# ImmediateBackend — сразу в запросе
+TASKS_BACKEND = os.getenv('TASKS_BACKEND', 'core.tasks.ThreadBackend')
+TASKS_WORKERS = 2
+TASKS_MAX_ATTEMPTS = 5
+# Задержка перед повтором, секунд; удваивается с каждой попыткой
+TASKS_RETRY_DELAY = 5
+# Сколько секунд задача DatabaseBackend принадлежит взявшему её воркеру
+TASKS_LEASE = 300
+
+# Ширины вариантов картинки поста для srcset
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+# Оригиналы больше этого размера по длинной стороне уменьшаются при загрузке
+POST_IMAGE_MAX_SIDE = 2560
+
+# Гистограммы времени ответа по представлениям (core/metrics.py): каждый
+# процесс сбрасывает снимок в METRICS_DIR, manage.py metrics их объединяет
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'yatube-metrics'))
+METRICS_FLUSH_INTERVAL = 10
+# Время рендера каждого шаблона и каждого {% include %} в метриках
+# представления: template:<шаблон>, include:<шаблон>:<строка> <что>
+TEMPLATE_PROFILING = os.getenv('TEMPLATE_PROFILING') == '1'
@@ -0,0 +1,14 @@
+"""Настройки для тестов: python manage.py test, pytest."""
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+# Отдельная база для тестов маршрутизации; по умолчанию не читается
+DATABASES['replica'] = dict(DATABASES['default'])
+
+# Тесты выполняют фоновые задачи сразу, без отдельных потоков
+TASKS_BACKEND = 'core.tasks.ImmediateBackend'
+# Кеш страниц целиком тесты включают через override_settings
+PAGE_CACHE = False
+# Снимки метрик не пишутся на диск
+METRICS_DIR = None